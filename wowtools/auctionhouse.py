@@ -1,14 +1,34 @@
+import asyncio
+import logging
+import time
 from datetime import datetime, timezone
-from typing import Dict
+from typing import Dict, List, Literal, Optional, Tuple
 
 import discord
+from discord.ext import tasks
 from redbot.core import commands
 from redbot.core.i18n import Translator
+from redbot.core.utils.chat_formatting import box
+from tabulate import tabulate
 
+from .auctions import COMMODITIES, find_item_price
+from .crafting import CraftPricer
+from .exceptions import InvalidBlizzardAPI, ItemNotFound, NoAuctionsFound, RealmNotFound
+from .metrics import timed_loop
+from .name_index import OBJ_TYPES, PAGE_SIZE
+from .price_service import PriceResult
+from .price_stats import PriceStats, bulk_price_stats
+from .price_watch import MAX_WATCHES, PriceAlert
 from .utils import format_to_gold
 
+log = logging.getLogger("red.karlo-cogs.wowtools")
 _ = Translator("WoWTools", __file__)
 
+# Most recent price history records shown
+PRICE_HISTORY_ROWS = 24
+# Recipes fetched at once while loading them
+RECIPE_BATCH_SIZE = 50
+
 
 class AuctionHouse:
     @commands.cooldown(rate=1, per=10, type=commands.BucketType.user)
@@ -43,11 +63,11 @@ class AuctionHouse:
                 ephemeral=True,
             )
             return
-        boe_disclaimer = False
 
         async with ctx.typing():
-            client = self.blizzard.get(config_region)
-            if not client:
+            try:
+                result = await self.price_service.lookup(config_region, config_realm, item)
+            except InvalidBlizzardAPI:
                 await ctx.send(
                     "The Blizzard API is not properly set up.\n"
                     "Create a client on https://develop.battle.net/ and then type in "
@@ -57,131 +77,561 @@ class AuctionHouse:
                     )
                 )
                 return
-            async with client as wow_client:
-                wow_client = wow_client.Retail
-                # Search for the item
-                await self.limiter.acquire()
-                items = await wow_client.GameData.get_item_search(
-                    {"name.en_US": item, "_pageSize": 1000}
-                )
+            except RealmNotFound:
+                await ctx.send(_("Could not find realm."))
+                return
+            except ItemNotFound:
+                await ctx.send(_("No results found."))
+                return
+            except NoAuctionsFound:
+                await ctx.send(_("No auctions could be found for this item."))
+                return
+            embed, view = await self.make_price_message(
+                result, config_realm, await ctx.embed_color()
+            )
+        await ctx.send(embed=embed, view=view)
 
-                results: Dict = items["results"]
-                found_items: Dict[int, str] = {}
-                for result in results:
-                    item_id: int = result["data"]["id"]
-                    item_name: str = result["data"]["name"]["en_US"]
-                    if found_items:
-                        if item_name in found_items.values():
-                            continue
-                    elif item.lower() in item_name.lower():
-                        item = item_name  # Use the exact name for all further searches
-                        found_items[item_id] = item_name
-                if not found_items:
-                    await ctx.send(_("No results found."))
-                    return
-
-                # Get connected realm ID
-                await self.limiter.acquire()
-                c_realms = await wow_client.GameData.get_connected_realms_search(
-                    {"_pageSize": 1000}
-                )
+    async def make_price_message(
+        self,
+        result: PriceResult,
+        realm: str,
+        colour: discord.Colour,
+        listings_str: Optional[str] = None,
+    ) -> Tuple[discord.Embed, discord.ui.View]:
+        """Build the embed and link button showing a price lookup's result."""
+        embed = discord.Embed(
+            title=_("Price: {item}").format(item=result.item_name),
+            url=f"https://www.wowhead.com/item={result.item_id}",
+            colour=colour,
+            timestamp=datetime.now(timezone.utc),
+        )
+        if result.icon_url:
+            embed.set_thumbnail(url=result.icon_url)
+        gold_emotes: Dict = await self.config.emotes()
+        embed.add_field(
+            name=_("Min Buyout"), value=format_to_gold(result.price.min_price, gold_emotes)
+        )
+        embed.add_field(name=_("Current quantity"), value=str(result.price.quantity))
+        if result.stats:
+            self.add_price_stats_fields(embed, result.stats, gold_emotes)
+        if listings_str:
+            embed.add_field(name=_("Current listings"), value=listings_str)
+        if result.price.buyout_only:
+            embed.add_field(
+                name=_("Warning"),
+                value=_(
+                    "The expected price of this item may be incorrect due to\n"
+                    "item level differences or other factors."
+                ),
+                inline=False,
+            )
 
-                c_realm_id = None
-                results: Dict = c_realms["results"]
-                for result in results:
-                    c_realm_data = result["data"]
-                    realms = c_realm_data["realms"]
-                    for realm in realms:
-                        realm_names = list(realm["name"].values())
-                        realm_names = [name.lower() for name in realm_names]
-                        if config_realm in realm_names:
-                            c_realm_id = c_realm_data["id"]
-                if not c_realm_id:
-                    await ctx.send(_("Could not find realm."))
-                    return
-
-                # Get price of item
-                await self.limiter.acquire()
-                auctions_data: Dict = await wow_client.GameData.get_auctions(
-                    connected_realm_id=c_realm_id
-                )
+        details_url = f"https://oribos.exchange/#{result.region}-{realm}/{result.item_id}"
+        view = discord.ui.View()
+        view.add_item(
+            discord.ui.Button(
+                label=_("More details"),
+                style=discord.ButtonStyle.link,
+                url=details_url,
+            )
+        )
+        return embed, view
 
-                auctions = auctions_data["auctions"]
-                prices = []
-                item_quantity = 0
-                for auction in auctions:
-                    item_id = auction["item"]["id"]
-                    if item_id in found_items:
-                        item_name = found_items[item_id]
-                        found_item_id = item_id
-                        item_quantity += auction["quantity"]
-                        try:
-                            item_price = auction["unit_price"]
-                        except KeyError:
-                            item_price = auction["buyout"]
-                            boe_disclaimer = True
-                        prices.append(item_price)
-                if not prices:
-                    # Item could be a commodity
-                    await self.limiter.acquire(25)
-                    commodities_data: Dict = await wow_client.GameData.get_commodities()
-                    auctions = commodities_data["auctions"]
-                    for auction in auctions:
-                        item_id = auction["item"]["id"]
-                        if item_id in found_items:
-                            item_name = found_items[item_id]
-                            found_item_id = item_id
-                            item_quantity += auction["quantity"]
-                            item_price = auction["unit_price"]
-                            prices.append(item_price)
-                if not prices:
-                    await ctx.send(_("No auctions could be found for this item."))
-                    return
-
-                # Embed stuff
-                # Get item icon
-                await self.limiter.acquire()
-                item_media = await wow_client.GameData.get_item_media(item_id=found_item_id)
-                item_icon_url = item_media["assets"][0]["value"]
-
-                # Create embed
-                embed_title = _("Price: {item}").format(item=item_name)
-                embed_url = f"https://www.wowhead.com/item={found_item_id}"
-                embed = discord.Embed(
-                    title=embed_title,
-                    url=embed_url,
-                    colour=await ctx.embed_color(),
-                    timestamp=datetime.now(timezone.utc),
+    @staticmethod
+    def add_price_stats_fields(embed: discord.Embed, stats: PriceStats, gold_emotes: Dict):
+        """Add the median, average, price range and cost of buying several to a price embed."""
+        embed.add_field(name=_("Median"), value=format_to_gold(stats.median, gold_emotes))
+        embed.add_field(name=_("Average"), value=format_to_gold(stats.mean, gold_emotes))
+        percentiles = dict(stats.percentiles)
+        embed.add_field(
+            name=_("10th - 90th percentile"),
+            value=f"{format_to_gold(percentiles[10], gold_emotes)} - "
+            f"{format_to_gold(percentiles[90], gold_emotes)}",
+        )
+        if stats.buy_costs:
+            embed.add_field(
+                name=_("Cost to buy"),
+                value="\n".join(
+                    f"{amount}x: {format_to_gold(cost, gold_emotes)}"
+                    for amount, cost in stats.buy_costs
+                ),
+                inline=False,
+            )
+
+    async def fetch_connected_realms(self, region: str) -> dict:
+        """Get every connected realm of a region from the Blizzard API."""
+        api_client = self.blizzard.get(region)
+        if not api_client:
+            raise InvalidBlizzardAPI
+        async with api_client as wow_client:
+            await self.limiter.acquire()
+            self.metrics.count_request("blizzard")
+            return await wow_client.Retail.GameData.get_connected_realms_search(
+                {"_pageSize": 1000}
+            )
+
+    async def fetch_name_page(self, obj_type: str, after_id: int) -> List[dict]:
+        """Get the next page of items or spells from the Blizzard API, ordered by ID."""
+        api_client = self.blizzard.get("us")
+        if not api_client:
+            raise InvalidBlizzardAPI
+        async with api_client as wow_client:
+            game_data = wow_client.Retail.GameData
+            search = (
+                game_data.get_item_search if obj_type == "item" else game_data.get_spell_search
+            )
+            await self.limiter.acquire()
+            self.metrics.count_request("blizzard")
+            results = await search(
+                {"id": f"[{after_id + 1},]", "orderby": "id", "_pageSize": PAGE_SIZE}
+            )
+        return results["results"]
+
+    @commands.group()
+    @commands.guild_only()
+    async def pricewatch(self, ctx: commands.Context):
+        """Get a DM when an item's price crosses a threshold."""
+        pass
+
+    @pricewatch.command(name="add")
+    @commands.cooldown(rate=1, per=10, type=commands.BucketType.user)
+    async def pricewatch_add(
+        self,
+        ctx: commands.Context,
+        direction: Literal["below", "above"],
+        gold: float,
+        *,
+        item: str,
+    ):
+        """Watch the price of an item on this server's realm.
+
+        You get a DM when the cheapest auction of the item goes below or above `gold`.
+
+        Example: `[p]pricewatch add below 150 Hochenblume`
+        """
+        watches: List[dict] = await self.config.user(ctx.author).price_watches()
+        if len(watches) >= MAX_WATCHES:
+            await ctx.send(_("You can't watch more than {max} items.").format(max=MAX_WATCHES))
+            return
+        if gold <= 0:
+            await ctx.send(_("The price has to be more than 0."))
+            return
+        async with ctx.typing():
+            auction_house = await self.get_guild_auction_house(ctx)
+            if not auction_house:
+                return
+            config_region, config_realm, c_realm_id = auction_house
+            found_items = await self.price_service.find_items(config_region, item)
+            if not found_items:
+                await ctx.send(_("No results found."))
+                return
+
+            # Watch the auction house the item is sold in
+            key = c_realm_id
+            found = find_item_price(
+                await self.auction_snapshots.get_auctions(config_region, c_realm_id), found_items
+            )
+            if found is None:
+                key = COMMODITIES
+                found = find_item_price(
+                    await self.auction_snapshots.get_commodities(config_region), found_items
                 )
-                embed.set_thumbnail(url=item_icon_url)
-                gold_emotes: Dict = await self.config.emotes()
-                min_buyout = format_to_gold(min(prices), gold_emotes)
-                embed.add_field(name=_("Min Buyout"), value=min_buyout)
-                embed.add_field(name=_("Current quantity"), value=str(item_quantity))
-                if boe_disclaimer:
-                    embed.add_field(
-                        name=_("Warning"),
-                        value=_(
-                            "The expected price of this item may be incorrect due to\n"
-                            "item level differences or other factors."
-                        ),
-                        inline=False,
+            if found is None:
+                await ctx.send(_("No auctions could be found for this item."))
+                return
+
+        found_item_id = found[0]
+        watch = {
+            "id": max((watch["id"] for watch in watches), default=0) + 1,
+            "item_id": found_item_id,
+            "name": found_items[found_item_id],
+            "region": config_region.lower(),
+            "key": key,
+            "realm": config_realm,
+            "threshold": round(gold * 10000),
+            "below": direction == "below",
+            "triggered": False,
+        }
+        watches.append(watch)
+        await self.config.user(ctx.author).price_watches.set(watches)
+        self.price_watchlist.load(await self.config.all_users())
+        gold_emotes: Dict = await self.config.emotes()
+        await ctx.send(
+            _("Watching **{item}**, you'll get a DM when it goes {direction} {price}.").format(
+                item=watch["name"],
+                direction=_("below") if watch["below"] else _("above"),
+                price=format_to_gold(watch["threshold"], gold_emotes),
+            )
+        )
+
+    @pricewatch.command(name="remove")
+    async def pricewatch_remove(self, ctx: commands.Context, watch_id: int):
+        """Stop watching an item, by the number shown in `[p]pricewatch list`."""
+        watches: List[dict] = await self.config.user(ctx.author).price_watches()
+        kept = [watch for watch in watches if watch["id"] != watch_id]
+        if len(kept) == len(watches):
+            await ctx.send(_("You don't have a watch with that number."))
+            return
+        await self.config.user(ctx.author).price_watches.set(kept)
+        self.price_watchlist.load(await self.config.all_users())
+        await ctx.send(_("Watch removed."))
+
+    @pricewatch.command(name="list")
+    async def pricewatch_list(self, ctx: commands.Context):
+        """List the items you're watching."""
+        watches: List[dict] = await self.config.user(ctx.author).price_watches()
+        if not watches:
+            await ctx.send(_("You're not watching any items."))
+            return
+        table = [
+            [
+                watch["id"],
+                watch["name"],
+                f"{_('below') if watch['below'] else _('above')} "
+                f"{format_to_gold(watch['threshold'])}",
+                f"{watch['region'].upper()}-{watch['realm']}",
+            ]
+            for watch in watches
+        ]
+        await ctx.send(
+            box(
+                tabulate(table, headers=["#", _("Item"), _("Alert when"), _("Realm")]),
+                lang="md",
+            )
+        )
+
+    @commands.command()
+    @commands.guild_only()
+    async def pricehistory(self, ctx: commands.Context, *, item: str):
+        """Show the recent prices of an item on this server's realm.
+
+        Prices are only recorded for items that someone is watching with `[p]pricewatch`.
+        """
+        auction_house = await self.get_guild_auction_house(ctx)
+        if not auction_house:
+            return
+        config_region, config_realm, c_realm_id = auction_house
+        found_items = await self.price_service.find_items(config_region, item)
+        if not found_items:
+            await ctx.send(_("No results found."))
+            return
+        item_name = next(iter(found_items.values()))
+
+        records = None
+        for key in (c_realm_id, COMMODITIES):
+            for item_id in found_items:
+                item_records = await self.price_history.get(config_region, key, item_id)
+                if len(item_records):
+                    records = item_records
+                    break
+            if records is not None:
+                break
+        if records is None:
+            await ctx.send(
+                _(
+                    "There's no price history for **{item}**. "
+                    "Prices are only recorded for items someone is watching."
+                ).format(item=item_name)
+            )
+            return
+
+        table = [
+            [
+                datetime.fromtimestamp(int(record["ts"]), timezone.utc).strftime("%m-%d %H:%M"),
+                format_to_gold(int(record["min_price"])),
+                format_to_gold(int(record["median"])),
+                int(record["quantity"]),
+            ]
+            for record in records[-PRICE_HISTORY_ROWS:]
+        ]
+        await ctx.send(
+            _("Price history of **{item}** (UTC):").format(item=item_name)
+            + box(
+                tabulate(table, headers=[_("Time"), _("Min"), _("Median"), _("Quantity")]),
+                lang="md",
+            )
+        )
+
+    @commands.cooldown(rate=1, per=10, type=commands.BucketType.user)
+    @commands.command()
+    @commands.guild_only()
+    async def craftprice(self, ctx: commands.Context, *, item: str):
+        """Get the cost of crafting an item with reagents from the auction house.
+
+        Reagents that are cheaper to craft than to buy are priced as crafted.
+        """
+        if not len(self.recipe_book):
+            await ctx.send(_("Recipes haven't been loaded yet, please try again later."))
+            return
+        async with ctx.typing():
+            auction_house = await self.get_guild_auction_house(ctx)
+            if not auction_house:
+                return
+            config_region, config_realm, c_realm_id = auction_house
+            found_items = await self.price_service.find_items(config_region, item)
+            if not found_items:
+                await ctx.send(_("No results found."))
+                return
+            item_name = next(iter(found_items.values()))
+            craftable = [
+                item_id for item_id in found_items if self.recipe_book.recipes_for(item_id)
+            ]
+            if not craftable:
+                await ctx.send(_("**{item}** can't be crafted.").format(item=item_name))
+                return
+
+            auctions = await self.auction_snapshots.get_auctions(config_region, c_realm_id)
+            commodities = await self.auction_snapshots.get_commodities(config_region)
+            pricer = self.craft_pricers.setdefault(
+                (config_region, c_realm_id), CraftPricer(self.recipe_book)
+            )
+            pricer.update(auctions, commodities)
+            costs = [pricer.cost(item_id) for item_id in craftable]
+            cost = min(
+                costs,
+                key=lambda c: c.craft_cost if c.craft_cost is not None else float("inf"),
+            )
+            if cost.craft_cost is None:
+                await ctx.send(
+                    _("Not every reagent of **{item}** is on the auction house.").format(
+                        item=item_name
                     )
+                )
+                return
 
-                details_url = (
-                    f"https://oribos.exchange/#{config_region}-{config_realm}/{found_item_id}"
+            gold_emotes: Dict = await self.config.emotes()
+            reagents = []
+            for reagent_id, amount in cost.recipe.reagents:
+                reagent = pricer.cost(reagent_id)
+                line = _("{amount}x {reagent}: {price}").format(
+                    amount=amount,
+                    reagent=self.recipe_book.names.get(reagent_id, reagent_id),
+                    price=format_to_gold(reagent.unit_cost * amount, gold_emotes),
                 )
-                view = discord.ui.View()
-                view.add_item(
-                    discord.ui.Button(
-                        label=_("More details"),
-                        style=discord.ButtonStyle.link,
-                        url=details_url,
+                if reagent.buy_price is None or reagent.unit_cost < reagent.buy_price:
+                    line += _(" (crafted)")
+                reagents.append(line)
+
+            embed = discord.Embed(
+                title=_("Crafting cost: {item}").format(item=item_name),
+                url=f"https://www.wowhead.com/item={cost.item_id}",
+                colour=await ctx.embed_color(),
+                timestamp=datetime.now(timezone.utc),
+            )
+            embed.add_field(
+                name=_("Crafting cost"), value=format_to_gold(cost.craft_cost, gold_emotes)
+            )
+            embed.add_field(
+                name=_("Min Buyout"),
+                value=format_to_gold(cost.buy_price, gold_emotes)
+                if cost.buy_price is not None
+                else _("Not listed"),
+            )
+            embed.add_field(
+                name=_("Recipe"),
+                value=f"{cost.recipe.name} ({cost.recipe.profession})",
+            )
+            embed.add_field(name=_("Reagents"), value="\n".join(reagents)[:1024], inline=False)
+            if cost.recipe.quantity != 1:
+                embed.set_footer(
+                    text=_("Costs are per item, a craft makes {quantity} on average.").format(
+                        quantity=cost.recipe.quantity
                     )
                 )
+        await ctx.send(embed=embed)
 
-        await ctx.send(embed=embed, view=view)
+    async def get_guild_auction_house(
+        self, ctx: commands.Context
+    ) -> Optional[Tuple[str, str, int]]:
+        """
+        Get the region, realm and connected realm ID of a guild's auction house.
+
+        Tells the user what's wrong and returns None if it isn't set up.
+        """
+        config_region: str = await self.config.guild(ctx.guild).region()
+        config_realm: str = await self.config.guild(ctx.guild).realm()
+        if not config_region or not config_realm or config_region == "cn":
+            await ctx.send(
+                _(
+                    "Please set a region and realm with `{prefix}wowset` before using this command."
+                ).format(prefix=ctx.clean_prefix)
+            )
+            return None
+        if not self.blizzard.get(config_region):
+            await ctx.send(_("The Blizzard API is not properly set up."))
+            return None
+        c_realm_id = await self.realm_index.get(config_region, config_realm)
+        if not c_realm_id:
+            await ctx.send(_("Could not find realm."))
+            return None
+        return config_region, config_realm, c_realm_id
+
+    async def check_price_watches(self):
+        """Record the prices of watched items and send alerts, once per new snapshot."""
+        for region, key in self.price_watchlist.auction_houses():
+            try:
+                if key == COMMODITIES:
+                    snapshot = await self.auction_snapshots.get_commodities(region)
+                else:
+                    snapshot = await self.auction_snapshots.get_auctions(region, key)
+            except Exception:
+                log.warning(f"Failed to get the auctions of {region} {key}.", exc_info=True)
+                continue
+            if not self.price_watchlist.is_new(snapshot):
+                continue
+
+            item_ids = self.price_watchlist.item_ids(region, key)
+            prices = await asyncio.to_thread(bulk_price_stats, snapshot.items, item_ids)
+            await self.price_history.append(region, key, int(time.time()), item_ids, *prices)
+            alerts, changed = self.price_watchlist.evaluate(snapshot, prices)
+            for user_id, watch_id, triggered in changed:
+                async with self.config.user_from_id(user_id).price_watches() as watches:
+                    for watch in watches:
+                        if watch["id"] == watch_id:
+                            watch["triggered"] = triggered
+            for alert in alerts:
+                await self.send_price_alert(alert)
+
+    async def send_price_alert(self, alert: PriceAlert):
+        user = self.bot.get_user(alert.user_id)
+        if user is None:
+            return
+        gold_emotes: Dict = await self.config.emotes()
+        watch = alert.watch
+        if watch["below"]:
+            description = _("The cheapest **{item}** is now {price}, below {threshold}.")
+        else:
+            description = _("The cheapest **{item}** is now {price}, above {threshold}.")
+        embed = discord.Embed(
+            title=_("Price alert: {item}").format(item=watch["name"]),
+            url=f"https://www.wowhead.com/item={watch['item_id']}",
+            description=description.format(
+                item=watch["name"],
+                price=format_to_gold(alert.min_price, gold_emotes),
+                threshold=format_to_gold(watch["threshold"], gold_emotes),
+            ),
+            colour=discord.Colour.blurple(),
+            timestamp=datetime.now(timezone.utc),
+        )
+        embed.add_field(name=_("Current quantity"), value=str(alert.quantity))
+        embed.add_field(name=_("Realm"), value=f"{watch['region'].upper()}-{watch['realm']}")
+        try:
+            await user.send(embed=embed)
+        except discord.HTTPException:
+            log.debug(f"Could not send a price alert to {alert.user_id}.")
+
+    async def fetch_recipes(self) -> Tuple[List[dict], Dict[int, str]]:
+        """
+        Get every recipe of the current expansion from the Blizzard API.
+
+        :return: The recipe responses with their profession's name, and the names of every
+            item they make or use.
+        """
+        api_client = self.blizzard.get("us")
+        if not api_client:
+            raise InvalidBlizzardAPI
+        async with api_client as wow_client:
+            game_data = wow_client.Retail.GameData
+            await self.limiter.acquire()
+            self.metrics.count_request("blizzard")
+            professions = (await game_data.get_professions_index())["professions"]
+
+            recipe_ids: List[Tuple[str, int]] = []
+            for profession in professions:
+                await self.limiter.acquire()
+                self.metrics.count_request("blizzard")
+                details = await game_data.get_profession(profession["id"])
+                if not details.get("skill_tiers"):
+                    continue
+                # Only the current expansion's recipes use reagents that are still sold
+                tier = max(details["skill_tiers"], key=lambda t: t["id"])
+                await self.limiter.acquire()
+                self.metrics.count_request("blizzard")
+                tier_data = await game_data.get_profession_skill_tier(profession["id"], tier["id"])
+                for category in tier_data.get("categories", []):
+                    for recipe in category.get("recipes", []):
+                        recipe_ids.append((details["name"], recipe["id"]))
+
+            responses = []
+            names: Dict[int, str] = {}
+            for start in range(0, len(recipe_ids), RECIPE_BATCH_SIZE):
+                batch = recipe_ids[start : start + RECIPE_BATCH_SIZE]
+                await self.limiter.acquire(len(batch))
+                self.metrics.count_request("blizzard", len(batch))
+                results = await asyncio.gather(
+                    *(game_data.get_recipe(recipe_id) for __, recipe_id in batch),
+                    return_exceptions=True,
+                )
+                for (profession_name, recipe_id), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        log.debug(f"Could not get recipe {recipe_id}: {result}")
+                        continue
+                    responses.append({"profession": profession_name, "recipe": result})
+                    for reagent in result.get("reagents", []):
+                        names[reagent["reagent"]["id"]] = reagent["reagent"]["name"]
+                    for key in ("crafted_item", "alliance_crafted_item", "horde_crafted_item"):
+                        if key in result:
+                            names[result[key]["id"]] = result[key]["name"]
+        return responses, names
+
+    @tasks.loop(minutes=10)
+    @timed_loop("refresh_auction_snapshots")
+    async def refresh_auction_snapshots(self):
+        # Keeps the auctions people are looking at warm, so price lookups don't have to wait
+        await self.auction_snapshots.refresh_in_use()
+        await self.check_price_watches()
+
+    @refresh_auction_snapshots.error
+    async def refresh_auction_snapshots_error(self, error):
+        log.error(f"Unhandled error in refresh_auction_snapshots task: {error}", exc_info=True)
+
+    @tasks.loop(hours=24)
+    @timed_loop("refresh_realm_index")
+    async def refresh_realm_index(self):
+        for region in self.blizzard:
+            if not self.realm_index.is_stale(region):
+                continue
+            try:
+                await self.realm_index.refresh(region)
+            except Exception:
+                log.warning(f"Failed to refresh the connected realms of {region}.", exc_info=True)
+
+    @refresh_realm_index.error
+    async def refresh_realm_index_error(self, error):
+        log.error(f"Unhandled error in refresh_realm_index task: {error}", exc_info=True)
+
+    @tasks.loop(hours=24)
+    @timed_loop("refresh_name_index")
+    async def refresh_name_index(self):
+        # Only fetches what was added since the last run, the first run builds the whole index
+        for obj_type in OBJ_TYPES:
+            try:
+                await self.name_index.refresh(obj_type)
+            except InvalidBlizzardAPI:
+                return
+            except Exception:
+                log.warning(f"Failed to refresh the {obj_type} name index.", exc_info=True)
+
+    @refresh_name_index.error
+    async def refresh_name_index_error(self, error):
+        log.error(f"Unhandled error in refresh_name_index task: {error}", exc_info=True)
+
+    @tasks.loop(hours=24)
+    @timed_loop("refresh_recipes")
+    async def refresh_recipes(self):
+        if not self.recipe_book.is_stale():
+            return
+        try:
+            await self.recipe_book.refresh()
+        except InvalidBlizzardAPI:
+            return
+        except Exception:
+            # Caught so one failed request doesn't stop the loop, it's retried on the next run
+            log.warning("Failed to refresh the recipes.", exc_info=True)
+
+    @refresh_recipes.error
+    async def refresh_recipes_error(self, error):
+        log.error(f"Unhandled error in refresh_recipes task: {error}", exc_info=True)
 
 
 # TODO: [p]stackprice [item]
-# TODO: [p]craftprice [item]
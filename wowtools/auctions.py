@@ -0,0 +1,317 @@
+import asyncio
+import codecs
+import json
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+import aiohttp
+from aiolimiter import AsyncLimiter
+from aiowowapi import WowApi
+
+from .exceptions import InvalidBlizzardAPI
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+# Blizzard updates auction data about once an hour, there's no point in asking more often
+CHECK_INTERVAL = 10 * 60
+# Snapshots that weren't looked at for this long are no longer refreshed and are dropped
+MAX_IDLE = 24 * 60 * 60
+COMMODITIES = "commodities"
+# The commodity dump is read and parsed this many bytes at a time
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class ItemPrice(NamedTuple):
+    min_price: int
+    quantity: int
+    # (unit price, quantity) of every price point, cheapest first
+    histogram: Tuple[Tuple[int, int], ...]
+    # Priced by buyout instead of unit price, so item level and such can make it inaccurate
+    buyout_only: bool
+
+
+class CommodityIndex:
+    """
+    Read-only item ID to price index backed by flat arrays instead of a dict per item.
+
+    ``item_ids`` is sorted, and the price points of ``item_ids[i]`` are
+    ``prices[offsets[i]:offsets[i + 1]]`` with matching ``quantities``, cheapest first.
+    """
+
+    __slots__ = ("item_ids", "offsets", "prices", "quantities")
+
+    def __init__(self, item_ids: array, offsets: array, prices: array, quantities: array):
+        self.item_ids = item_ids
+        self.offsets = offsets
+        self.prices = prices
+        self.quantities = quantities
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def get(self, item_id: int) -> Optional[ItemPrice]:
+        index = bisect_left(self.item_ids, item_id)
+        if index == len(self.item_ids) or self.item_ids[index] != item_id:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        quantities = self.quantities[start:end]
+        return ItemPrice(
+            min_price=self.prices[start],
+            quantity=sum(quantities),
+            histogram=tuple(zip(self.prices[start:end], quantities)),
+            buyout_only=False,
+        )
+
+
+class CommodityStreamParser:
+    """
+    Builds a ``CommodityIndex`` from a commodities response fed in arbitrary chunks.
+
+    Only the auction currently being decoded and the price points per item are kept in memory,
+    the response as a whole and its list of auctions never are.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._in_auctions = False
+        self._done = False
+        # item ID: {unit price: quantity}
+        self._price_points: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def feed(self, chunk: bytes) -> None:
+        if self._done:
+            return
+        buffer = self._buffer + self._text.decode(chunk)
+        pos = 0
+        if not self._in_auctions:
+            key = buffer.find('"auctions"')
+            bracket = buffer.find("[", key) if key != -1 else -1
+            if bracket == -1:
+                # Keep enough to find the key if it's split between chunks
+                self._buffer = buffer[key:] if key != -1 else buffer[-len('"auctions"') :]
+                return
+            self._in_auctions = True
+            pos = bracket + 1
+
+        length = len(buffer)
+        while True:
+            while pos < length and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == length:
+                break
+            if buffer[pos] == "]":
+                self._done = True
+                break
+            try:
+                auction, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The rest of this auction is in the next chunk
+                break
+            self._price_points[auction["item"]["id"]][auction["unit_price"]] += auction["quantity"]
+            pos = end
+        self._buffer = buffer[pos:]
+
+    def finish(self) -> CommodityIndex:
+        if not self._done:
+            raise ValueError("The commodities response ended before its list of auctions.")
+        item_ids = array("q")
+        offsets = array("q", [0])
+        prices = array("q")
+        quantities = array("q")
+        for item_id in sorted(self._price_points):
+            points = self._price_points[item_id]
+            item_ids.append(item_id)
+            for price in sorted(points):
+                prices.append(price)
+                quantities.append(points[price])
+            offsets.append(len(prices))
+        self._price_points.clear()
+        return CommodityIndex(item_ids, offsets, prices, quantities)
+
+
+class AuctionSnapshot(NamedTuple):
+    region: str
+    # Connected realm ID, or COMMODITIES for the region wide commodity auction house
+    key: Union[int, str]
+    items: Union[Dict[int, ItemPrice], CommodityIndex]
+    last_modified: Optional[str]
+    # When Blizzard was last asked for a newer snapshot
+    checked: float
+
+
+class AuctionSnapshotStore:
+    """
+    In-memory index of auction house data, per connected realm and region.
+
+    Each snapshot is downloaded once per Blizzard update and turned into an item ID to price
+    index, so looking up a price never touches the raw data. Snapshots are checked for updates
+    with If-Modified-Since, so an unchanged snapshot costs one tiny request.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        get_client: Callable[[str], Optional[WowApi]],
+        limiter: AsyncLimiter,
+    ):
+        self.session = session
+        self.get_client = get_client
+        self.limiter = limiter
+        self._snapshots: Dict[Tuple[str, Union[int, str]], AuctionSnapshot] = {}
+        self._last_used: Dict[Tuple[str, Union[int, str]], float] = {}
+        self._locks: Dict[Tuple[str, Union[int, str]], asyncio.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    async def get_auctions(self, region: str, connected_realm_id: int) -> AuctionSnapshot:
+        """Get the auctions of a connected realm."""
+        return await self._get(region.lower(), connected_realm_id)
+
+    async def get_commodities(self, region: str) -> AuctionSnapshot:
+        """Get the region wide commodity auctions."""
+        return await self._get(region.lower(), COMMODITIES)
+
+    async def refresh_in_use(self) -> None:
+        """Check every recently used snapshot for updates, and drop the ones nobody uses."""
+        now = time.time()
+        for key, last_used in list(self._last_used.items()):
+            if now - last_used > MAX_IDLE:
+                self._snapshots.pop(key, None)
+                self._last_used.pop(key, None)
+                self._locks.pop(key, None)
+                continue
+            try:
+                # Forced, the loop runs every CHECK_INTERVAL so the snapshot is never quite stale
+                await self._refresh(*key, force=True)
+            except Exception:
+                log.warning(f"Failed to refresh auctions of {key}.", exc_info=True)
+
+    async def _get(self, region: str, key: Union[int, str]) -> AuctionSnapshot:
+        self._last_used[(region, key)] = time.time()
+        snapshot = self._snapshots.get((region, key))
+        if snapshot is not None and time.time() - snapshot.checked < CHECK_INTERVAL:
+            return snapshot
+        return await self._refresh(region, key)
+
+    async def _refresh(
+        self, region: str, key: Union[int, str], force: bool = False
+    ) -> AuctionSnapshot:
+        """
+        :param force: Check for a newer snapshot even if the current one was checked less than
+            ``CHECK_INTERVAL`` ago.
+        """
+        lock = self._locks.setdefault((region, key), asyncio.Lock())
+        async with lock:
+            snapshot = self._snapshots.get((region, key))
+            # Someone else may have refreshed it while this was waiting for the lock
+            if (
+                not force
+                and snapshot is not None
+                and time.time() - snapshot.checked < CHECK_INTERVAL
+            ):
+                return snapshot
+
+            client = self.get_client(region)
+            if not client:
+                raise InvalidBlizzardAPI
+            if key == COMMODITIES:
+                endpoint = "/data/wow/auctions/commodities"
+            else:
+                endpoint = f"/data/wow/connected-realm/{key}/auctions"
+            headers = {"Authorization": f"Bearer {await client.get_access_token()}"}
+            if snapshot is not None and snapshot.last_modified:
+                headers["If-Modified-Since"] = snapshot.last_modified
+
+            # The commodity dump is much larger than a realm's
+            await self.limiter.acquire(25 if key == COMMODITIES else 1)
+            # When the request was made, downloading the commodities can take a while
+            checked = time.time()
+            async with self.session.get(
+                client.get_hostname().format(api_endpoint=endpoint),
+                params={"namespace": f"dynamic-{region}"},
+                headers=headers,
+            ) as resp:
+                if resp.status == 304 and snapshot is not None:
+                    snapshot = snapshot._replace(checked=checked)
+                    self._snapshots[(region, key)] = snapshot
+                    return snapshot
+                resp.raise_for_status()
+                last_modified = resp.headers.get("Last-Modified")
+                # Parsing tens of megabytes of JSON would block the bot for a while
+                if key == COMMODITIES:
+                    parser = CommodityStreamParser()
+                    async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        await asyncio.to_thread(parser.feed, chunk)
+                    items = await asyncio.to_thread(parser.finish)
+                else:
+                    items = await asyncio.to_thread(index_auctions, await resp.read())
+
+            snapshot = AuctionSnapshot(region, key, items, last_modified, checked)
+            self._snapshots[(region, key)] = snapshot
+            log.debug(f"Auctions of {region} {key} updated, {len(items)} items.")
+            return snapshot
+
+
+def index_auctions(data: bytes) -> Dict[int, ItemPrice]:
+    """Turn an auctions or commodities response into an item ID to price index."""
+    # item ID: {unit price: quantity}
+    price_points: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    buyout_only = set()
+    for auction in json.loads(data)["auctions"]:
+        item_id = auction["item"]["id"]
+        price = auction.get("unit_price")
+        if price is None:
+            price = auction.get("buyout")
+            if price is None:
+                # Bid only
+                continue
+            buyout_only.add(item_id)
+        price_points[item_id][price] += auction["quantity"]
+
+    items = {}
+    for item_id, prices in price_points.items():
+        histogram = tuple(sorted(prices.items()))
+        items[item_id] = ItemPrice(
+            min_price=histogram[0][0],
+            quantity=sum(quantity for __, quantity in histogram),
+            histogram=histogram,
+            buyout_only=item_id in buyout_only,
+        )
+    return items
+
+
+def find_item_price(
+    snapshot: AuctionSnapshot, item_ids: Iterable[int]
+) -> Optional[Tuple[int, ItemPrice]]:
+    """
+    Combine the prices of several item IDs that share a name.
+
+    :return: The last found item ID and the combined price, or None if none are listed.
+    """
+    found_item_id = None
+    points: Dict[int, int] = defaultdict(int)
+    buyout_only = False
+    for item_id in item_ids:
+        item_price = snapshot.items.get(item_id)
+        if item_price is None:
+            continue
+        found_item_id = item_id
+        buyout_only = buyout_only or item_price.buyout_only
+        for price, quantity in item_price.histogram:
+            points[price] += quantity
+    if found_item_id is None:
+        return None
+    histogram = tuple(sorted(points.items()))
+    return found_item_id, ItemPrice(
+        min_price=histogram[0][0],
+        quantity=sum(points.values()),
+        histogram=histogram,
+        buyout_only=buyout_only,
+    )
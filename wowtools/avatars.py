@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+# The disk cache is swept for expired thumbnails at most this often, in seconds
+PRUNE_INTERVAL = 60 * 60
+
+
+class AvatarCache:
+    """
+    Cache for character thumbnails from render.worldofwarcraft.com.
+
+    Thumbnails are kept in a bounded in-memory LRU and on disk, keyed by URL. Entries younger
+    than ``max_age`` seconds are served without any request, older ones are revalidated
+    with ETag/Last-Modified so unchanged thumbnails aren't downloaded again. Thumbnails
+    that weren't fetched or revalidated for ``max_disk_age`` seconds are deleted from the disk.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        path: Path,
+        max_items: int = 500,
+        max_age: int = 3600,
+        max_disk_age: int = 7 * 24 * 60 * 60,
+    ):
+        self.session = session
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.max_age = max_age
+        self.max_disk_age = max_disk_age
+        self._last_pruned = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+        self._memory: OrderedDict[str, Tuple[bytes, dict]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / lookups if lookups else 0.0
+
+    async def get_many(self, urls: List[str]) -> List[Optional[bytes]]:
+        """Fetch several thumbnails concurrently, keeping the order of ``urls``."""
+        return list(await asyncio.gather(*(self.get(url) for url in urls)))
+
+    async def get(self, url: str) -> Optional[bytes]:
+        """Get a thumbnail, or None if it couldn't be fetched and isn't cached."""
+        if url in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[url])
+        task = asyncio.create_task(self._get(url))
+        self._inflight[url] = task
+        task.add_done_callback(lambda _t: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _get(self, url: str) -> Optional[bytes]:
+        cached = self._memory.get(url)
+        if cached is None:
+            cached = await asyncio.to_thread(self._read_disk, url)
+        if cached is not None:
+            self._remember(url, *cached)
+            data, meta = cached
+            if time.time() - meta["checked"] < self.max_age:
+                self.hits += 1
+                return data
+        else:
+            self.misses += 1
+            meta = {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            async with self.session.request("GET", url, headers=headers) as resp:
+                if resp.status == 304 and cached is not None:
+                    self.revalidated += 1
+                    data = cached[0]
+                elif resp.status == 200:
+                    data = await resp.read()
+                    meta = {
+                        "etag": resp.headers.get("ETag"),
+                        "last_modified": resp.headers.get("Last-Modified"),
+                    }
+                else:
+                    log.debug(f"Fetching thumbnail {url} failed with status {resp.status}.")
+                    return cached[0] if cached else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            log.debug(f"Fetching thumbnail {url} failed.", exc_info=True)
+            return cached[0] if cached else None
+
+        meta["checked"] = time.time()
+        self._remember(url, data, meta)
+        await asyncio.to_thread(self._write_disk, url, data, meta)
+        if time.time() - self._last_pruned > PRUNE_INTERVAL:
+            self._last_pruned = time.time()
+            await asyncio.to_thread(self._prune_disk)
+        return data
+
+    def _remember(self, url: str, data: bytes, meta: dict) -> None:
+        self._memory[url] = (data, meta)
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _file_stem(self, url: str) -> Path:
+        return self.path / hashlib.sha1(url.encode()).hexdigest()
+
+    def _read_disk(self, url: str) -> Optional[Tuple[bytes, dict]]:
+        stem = self._file_stem(url)
+        try:
+            data = stem.with_suffix(".bin").read_bytes()
+            meta = json.loads(stem.with_suffix(".json").read_text())
+        except (OSError, ValueError):
+            return None
+        return data, meta
+
+    def _write_disk(self, url: str, data: bytes, meta: dict) -> None:
+        stem = self._file_stem(url)
+        try:
+            stem.with_suffix(".bin").write_bytes(data)
+            stem.with_suffix(".json").write_text(json.dumps(meta))
+        except OSError:
+            log.warning(f"Could not write thumbnail {url} to the disk cache.", exc_info=True)
+
+    def _prune_disk(self) -> None:
+        # Files are rewritten on every fetch and revalidation, so their mtime is their last use
+        expired = time.time() - self.max_disk_age
+        removed = 0
+        for file in self.path.iterdir():
+            try:
+                if file.stat().st_mtime < expired:
+                    file.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            log.debug(f"Removed {removed} expired thumbnail files from the disk cache.")
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    In-memory cache where every entry expires after a fixed amount of time.
+
+    Concurrent lookups for a key that is not cached yet are collapsed into a single
+    call of the fetch function, every other caller waits for that same result.
+    Failed fetches are not cached.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for a key, or None if it's missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop a single key, or everything if no key is given."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a value from the cache, fetching and storing it if needed.
+
+        :param key: Cache key.
+        :param fetch: Coroutine function called without arguments when the key isn't cached.
+        :return: The cached or freshly fetched value.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if key in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        # Shielded so a cancelled caller doesn't cancel the fetch for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hit_ratio,
+        }
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .auctions import AuctionSnapshot
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+# Recipes only change with patches
+MAX_AGE = 7 * 24 * 60 * 60
+
+
+class Recipe(NamedTuple):
+    id: int
+    name: str
+    profession: str
+    item_id: int
+    # Average amount made per craft
+    quantity: float
+    # (item ID, amount)
+    reagents: Tuple[Tuple[int, int], ...]
+
+
+class CraftCost(NamedTuple):
+    item_id: int
+    # Cheapest of buying and crafting one, None if it can be neither bought nor crafted
+    unit_cost: Optional[int]
+    buy_price: Optional[int]
+    # Cheapest recipe and what crafting one with it costs, buying or crafting each reagent
+    recipe: Optional[Recipe]
+    craft_cost: Optional[int]
+
+
+def parse_recipe(data: dict, profession: str) -> List[Recipe]:
+    """Turn a recipe response into recipes, one per item it makes."""
+    crafted_items = [
+        data[key]
+        for key in ("crafted_item", "alliance_crafted_item", "horde_crafted_item")
+        if key in data
+    ]
+    reagents = tuple(
+        (reagent["reagent"]["id"], reagent["quantity"]) for reagent in data.get("reagents", [])
+    )
+    if not crafted_items or not reagents:
+        return []
+    crafted_quantity = data.get("crafted_quantity", {})
+    if "value" in crafted_quantity:
+        quantity = crafted_quantity["value"]
+    else:
+        quantity = (crafted_quantity.get("minimum", 1) + crafted_quantity.get("maximum", 1)) / 2
+    return [
+        Recipe(data["id"], data["name"], profession, item["id"], quantity or 1, reagents)
+        for item in crafted_items
+    ]
+
+
+class RecipeBook:
+    """
+    Every known recipe as a graph from crafted items to their reagents.
+
+    Kept on the disk, since fetching every recipe takes a few thousand requests.
+    """
+
+    def __init__(self, path: Path, fetch: Callable[[], Awaitable[Tuple[List[dict], dict]]]):
+        """
+        :param path: JSON file the recipes are stored in.
+        :param fetch: Coroutine function that gets every recipe as
+            ``([{"profession": name, "recipe": recipe response}], {item ID: item name})``.
+        """
+        self.path = path
+        self.fetch = fetch
+        # Goes up every time the recipes change, so memoized costs can tell they're outdated
+        self.version = 0
+        self.updated = 0.0
+        self.names: Dict[int, str] = {}
+        self._recipes: Dict[int, List[Recipe]] = {}
+        # reagent item ID: IDs of the items crafted with it
+        self._used_in: Dict[int, Set[int]] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(recipes) for recipes in self._recipes.values())
+
+    def is_stale(self) -> bool:
+        return time.time() - self.updated > MAX_AGE
+
+    def recipes_for(self, item_id: int) -> List[Recipe]:
+        return self._recipes.get(item_id, [])
+
+    def crafted_with(self, item_ids: Iterable[int]) -> Set[int]:
+        """Every item crafted with any of these items, directly or through intermediates."""
+        found: Set[int] = set()
+        pending = list(item_ids)
+        while pending:
+            for crafted_id in self._used_in.get(pending.pop(), ()):
+                if crafted_id not in found:
+                    found.add(crafted_id)
+                    pending.append(crafted_id)
+        return found
+
+    async def load(self) -> None:
+        try:
+            data = json.loads(await asyncio.to_thread(self.path.read_text))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            log.warning("Could not read the recipes.", exc_info=True)
+            return
+        self._build(
+            [Recipe(*recipe[:5], tuple(map(tuple, recipe[5]))) for recipe in data["recipes"]],
+            {int(item_id): name for item_id, name in data["names"].items()},
+        )
+        self.updated = data["updated"]
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            if not self.is_stale():
+                return
+            responses, names = await self.fetch()
+            recipes = [
+                recipe
+                for response in responses
+                for recipe in parse_recipe(response["recipe"], response["profession"])
+            ]
+            self._build(recipes, names)
+            self.updated = time.time()
+            data = json.dumps(
+                {
+                    "updated": self.updated,
+                    "recipes": [
+                        recipe for recipes in self._recipes.values() for recipe in recipes
+                    ],
+                    "names": self.names,
+                }
+            )
+            await asyncio.to_thread(self._write, data)
+            log.debug(f"Recipes refreshed, {len(self)} recipes.")
+
+    def _build(self, recipes: List[Recipe], names: Dict[int, str]) -> None:
+        by_item = defaultdict(list)
+        used_in = defaultdict(set)
+        for recipe in recipes:
+            by_item[recipe.item_id].append(recipe)
+            for reagent_id, __ in recipe.reagents:
+                used_in[reagent_id].add(recipe.item_id)
+        self._recipes = dict(by_item)
+        self._used_in = dict(used_in)
+        self.names = names
+        self.version += 1
+
+    def _write(self, data: str) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            log.warning("Could not save the recipes.", exc_info=True)
+
+
+class CraftPricer:
+    """
+    Memoized crafting costs over one connected realm's auctions and its region's commodities.
+
+    Every cost is computed once. When newer snapshots come in, only the costs of items whose
+    buy price changed, and of everything crafted with them, are thrown away.
+    """
+
+    def __init__(self, book: RecipeBook):
+        self.book = book
+        self._memo: Dict[int, CraftCost] = {}
+        # Buy prices the memoized costs were computed with
+        self._buy_prices: Dict[int, Optional[int]] = {}
+        self._auctions: Optional[AuctionSnapshot] = None
+        self._commodities: Optional[AuctionSnapshot] = None
+        self._book_version = book.version
+
+    def update(self, auctions: AuctionSnapshot, commodities: AuctionSnapshot) -> int:
+        """
+        Use newer snapshots, forgetting the costs their price changes affect.
+
+        :return: How many memoized costs were forgotten.
+        """
+        if self._book_version != self.book.version:
+            forgotten = len(self._memo)
+            self._memo.clear()
+            self._buy_prices.clear()
+            self._book_version = self.book.version
+        elif (
+            self._auctions is not None
+            and auctions.items is self._auctions.items
+            and commodities.items is self._commodities.items
+        ):
+            return 0
+        else:
+            forgotten = 0
+        self._auctions, self._commodities = auctions, commodities
+
+        changed = [
+            item_id
+            for item_id, price in self._buy_prices.items()
+            if self._buy_price(item_id) != price
+        ]
+        for item_id in {*changed, *self.book.crafted_with(changed)}:
+            self._buy_prices.pop(item_id, None)
+            if self._memo.pop(item_id, None):
+                forgotten += 1
+        return forgotten
+
+    def cost(self, item_id: int) -> CraftCost:
+        """Get the cheapest way to get one of an item, crafting intermediates where cheaper."""
+        return self._cost(item_id, set())[0]
+
+    def _buy_price(self, item_id: int) -> Optional[int]:
+        for snapshot in (self._commodities, self._auctions):
+            if snapshot is None:
+                continue
+            item_price = snapshot.items.get(item_id)
+            if item_price is not None:
+                return item_price.min_price
+        return None
+
+    def _cost(self, item_id: int, crafting: Set[int]) -> Tuple[CraftCost, Set[int]]:
+        """
+        :param crafting: Items further up that are being crafted, using one of those as a
+            reagent would be a loop, so they're only bought.
+        :return: The cost, and the items of ``crafting`` that had to be bought because of that.
+            A cost that depends on those isn't memoized, it only holds for this path.
+        """
+        memoized = self._memo.get(item_id)
+        if memoized is not None:
+            return memoized, set()
+
+        buy_price = self._buy_price(item_id)
+        self._buy_prices[item_id] = buy_price
+        cut: Set[int] = set()
+        best_recipe = None
+        best_cost = None
+        crafting.add(item_id)
+        for recipe in self.book.recipes_for(item_id):
+            total = 0
+            for reagent_id, amount in recipe.reagents:
+                if reagent_id in crafting:
+                    cut.add(reagent_id)
+                    reagent_cost = self._buy_price(reagent_id)
+                else:
+                    reagent, reagent_cut = self._cost(reagent_id, crafting)
+                    cut |= reagent_cut
+                    reagent_cost = reagent.unit_cost
+                if reagent_cost is None:
+                    break
+                total += reagent_cost * amount
+            else:
+                craft_cost = round(total / recipe.quantity)
+                if best_cost is None or craft_cost < best_cost:
+                    best_recipe, best_cost = recipe, craft_cost
+        crafting.discard(item_id)
+        cut.discard(item_id)
+
+        options = [price for price in (buy_price, best_cost) if price is not None]
+        result = CraftCost(
+            item_id=item_id,
+            unit_cost=min(options) if options else None,
+            buy_price=buy_price,
+            recipe=best_recipe,
+            craft_cost=best_cost,
+        )
+        if not cut:
+            self._memo[item_id] = result
+        return result, cut
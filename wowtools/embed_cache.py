@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import discord
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+# Changes are written to the disk at most this often, and when the cog unloads
+SAVE_DELAY = 60
+
+# (object type, ID, locale)
+EmbedKey = Tuple[str, int, str]
+
+
+class EmbedCache:
+    """
+    Bounded LRU of the embeds shown for ``[[name]]`` searches.
+
+    Embeds are stored as their dicts and rebuilt on every hit, so a cached embed can't be
+    changed by whoever got it last. The cache is kept in a JSON file across restarts.
+    Concurrent lookups for an embed that isn't cached yet are collapsed into one fetch.
+    """
+
+    def __init__(self, path: Path, max_items: int = 2000):
+        self.path = path
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: OrderedDict[EmbedKey, dict] = OrderedDict()
+        self._inflight: Dict[EmbedKey, asyncio.Task] = {}
+        self._save_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / lookups if lookups else 0.0
+
+    async def get_or_fetch(
+        self, key: EmbedKey, fetch: Callable[[], Awaitable[discord.Embed]]
+    ) -> discord.Embed:
+        """
+        Get an embed from the cache, fetching and storing it if needed.
+
+        :param key: (object type, ID, locale), spells and items can share IDs.
+        :param fetch: Coroutine function called without arguments when the key isn't cached.
+        """
+        data = self._entries.get(key)
+        if data is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return discord.Embed.from_dict(data)
+
+        if key in self._inflight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # Shielded so a cancelled caller doesn't cancel the fetch for everyone else waiting on it
+        embed = await asyncio.shield(self._inflight[key])
+        return discord.Embed.from_dict(embed.to_dict())
+
+    async def load(self) -> None:
+        try:
+            data = json.loads(await asyncio.to_thread(self.path.read_text))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            log.warning("Could not read the embed cache.", exc_info=True)
+            return
+        # Stored from least to most recently used
+        for obj_type, obj_id, locale, embed in data[-self.max_items :]:
+            self._entries[(obj_type, obj_id, locale)] = embed
+
+    async def save(self) -> None:
+        """Write the cache to the disk now, instead of waiting for the scheduled save."""
+        if self._save_task and not self._save_task.done():
+            self._save_task.cancel()
+        self._save_task = None
+        await asyncio.to_thread(self._write, self._dump())
+
+    def _finish(self, key: EmbedKey, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[key] = task.result().to_dict()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(SAVE_DELAY)
+        self._save_task = None
+        await asyncio.to_thread(self._write, self._dump())
+
+    def _dump(self) -> str:
+        return json.dumps([[*key, embed] for key, embed in self._entries.items()])
+
+    def _write(self, data: str) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            log.warning("Could not save the embed cache.", exc_info=True)
@@ -1,2 +1,14 @@
 class InvalidBlizzardAPI(Exception):
     pass
+
+
+class RealmNotFound(Exception):
+    pass
+
+
+class ItemNotFound(Exception):
+    pass
+
+
+class NoAuctionsFound(Exception):
+    pass
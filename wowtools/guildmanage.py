@@ -12,6 +12,7 @@ from tabulate import tabulate
 from json import JSONDecodeError
 
 from .exceptions import InvalidBlizzardAPI
+from .metrics import timed_loop
 
 _ = Translator("WoWTools", __file__)
 log = logging.getLogger("red.karlo-cogs.wowtools")
@@ -110,21 +111,27 @@ class GuildManage:
         except Exception as e:
             await ctx.send(_("Command failed successfully. {e}").format(e=e))
 
-    async def get_guild_roster(self, guild: discord.Guild) -> dict[str, int]:
+    async def get_guild_roster(
+        self, guild: discord.Guild, guild_config: dict | None = None
+    ) -> dict[str, int]:
         """
         Get guild roster from Blizzard's API.
 
         :param guild:
+        :param guild_config: Already loaded config of the guild, read from Config if not given
         :return: dict containing guild members and their rank
         """
-        wow_guild_name: str = await self.config.guild(guild).gmanage_guild()
+        if guild_config is None:
+            guild_config = await self.config.guild(guild).all()
+        wow_guild_name: str = guild_config["gmanage_guild"]
         wow_guild_name = wow_guild_name.lower()
-        region: str = await self.config.guild(guild).region()
-        realm: str = await self.config.guild(guild).gmanage_realm()
+        region: str = guild_config["region"]
+        realm: str = guild_config["gmanage_realm"]
         realm = realm.lower()
 
         if not self.blizzard.get(region):
             raise InvalidBlizzardAPI
+        self.metrics.count_request("blizzard")
         async with self.blizzard.get(region) as wow_client:
             wow_client = wow_client.Retail
             guild_roster = await wow_client.Profile.get_guild_roster(
@@ -187,15 +194,21 @@ class GuildManage:
         await ctx.send(_("Guild log channel set to {channel}.").format(channel=channel.mention))
 
     @tasks.loop(minutes=5)
+    @timed_loop("guild_log")
     async def guild_log(self):
-        for guild in self.bot.guilds:
+        # One snapshot of the config per tick instead of several reads per guild
+        all_guilds: dict[int, dict] = await self.config.all_guilds()
+        for guild_id, guild_config in all_guilds.items():
+            guild_log_channel: int = guild_config["guild_log_channel"]
+            if guild_log_channel is None:
+                continue
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
             if await self.bot.cog_disabled_in_guild(self, guild):
                 continue
             await set_contextual_locales_from_guild(self.bot, guild)
 
-            guild_log_channel: int = await self.config.guild(guild).guild_log_channel()
-            if guild_log_channel is None:
-                continue
             guild_log_channel: discord.TextChannel | discord.Thread = guild.get_channel_or_thread(
                 guild_log_channel
             )
@@ -204,7 +217,7 @@ class GuildManage:
 
             log.debug("Comparing guild rosters.")
             try:
-                current_roster = await self.get_guild_roster(guild)
+                current_roster = await self.get_guild_roster(guild, guild_config)
             except InvalidBlizzardAPI:
                 log.warning(
                     "The Blizzard API is not properly set up.\n"
@@ -216,7 +229,7 @@ class GuildManage:
             except (RuntimeError, JSONDecodeError):
                 # blizzard bullshit at the moment, try again later
                 return
-            previous_roster: dict[str, int] = await self.config.guild(guild).guild_roster()
+            previous_roster: dict[str, int] = guild_config["guild_roster"]
 
             # Have to do this now because the key will include the realm name, meaning comparing
             # means everything in previous will be different and it will send a message for
@@ -0,0 +1,165 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from .scoreboard_diff import parse_score
+
+# About a season, older samples are dropped
+MAX_AGE = 180 * 24 * 60 * 60
+MAX_SAMPLES_PER_GUILD = 100_000
+# How often old samples are pruned, in seconds
+PRUNE_INTERVAL = 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (guild_id, name)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    guild_id INTEGER NOT NULL,
+    character_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    ilvl INTEGER,
+    PRIMARY KEY (character_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_guild_ts ON samples (guild_id, ts);
+"""
+
+
+class CharacterHistory(NamedTuple):
+    name: str
+    timestamps: array
+    scores: array
+    # 0 where the item level wasn't known, text scoreboards don't fetch it
+    ilvls: array
+
+
+class ScoreboardHistory:
+    """
+    Append-only time series of every guild's scoreboard, stored in a SQLite file.
+
+    A sample is only stored when a character's score or item level differs from their last
+    sample, so quiet characters cost nothing between changes. Samples older than ``MAX_AGE``
+    and anything past ``MAX_SAMPLES_PER_GUILD`` per guild are pruned.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # guild ID: {character name: (score, ilvl)} of the latest stored samples
+        self._last: dict[int, dict[str, tuple[int, Optional[int]]]] = {}
+        self._last_prune = 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    async def append(self, guild_id: int, tabulate_list: List[list]) -> int:
+        """
+        Record a scoreboard's rows.
+
+        :param tabulate_list: Rows as returned by ``Scoreboard._get_dungeon_scores``.
+        :return: How many samples were stored.
+        """
+        return await asyncio.to_thread(self._append, guild_id, tabulate_list, int(time.time()))
+
+    async def get(self, guild_id: int, character: str) -> Optional[CharacterHistory]:
+        """Get a character's samples in a guild, oldest first, or None if there are none."""
+        return await asyncio.to_thread(self._get, guild_id, character.lower())
+
+    def _append(self, guild_id: int, tabulate_list: List[list], now: int) -> int:
+        with self._lock:
+            last = self._last.get(guild_id)
+            if last is None:
+                last = self._last[guild_id] = self._load_last(guild_id)
+
+            samples = []
+            for row in tabulate_list:
+                name = row[1].lower()
+                score = parse_score(row[2])
+                previous = last.get(name)
+                if len(row) > 6:
+                    ilvl = int(float(row[6]))
+                else:
+                    # Text scoreboards have no item level, carry the last known one forward so
+                    # switching between text and images doesn't count as a change
+                    ilvl = previous[1] if previous else None
+                if previous == (score, ilvl):
+                    continue
+                last[name] = (score, ilvl)
+                samples.append((guild_id, self._character_id(guild_id, name), now, score, ilvl))
+
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)", samples
+                )
+            if now - self._last_prune > PRUNE_INTERVAL:
+                self._prune(now)
+            return len(samples)
+
+    def _get(self, guild_id: int, name: str) -> Optional[CharacterHistory]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT s.ts, s.score, s.ilvl FROM samples s "
+                "JOIN characters c ON c.id = s.character_id "
+                "WHERE c.guild_id = ? AND c.name = ? ORDER BY s.ts",
+                (guild_id, name),
+            ).fetchall()
+        if not rows:
+            return None
+        history = CharacterHistory(name, array("q"), array("l"), array("l"))
+        for ts, score, ilvl in rows:
+            history.timestamps.append(ts)
+            history.scores.append(score)
+            history.ilvls.append(ilvl or 0)
+        return history
+
+    def _load_last(self, guild_id: int) -> dict[str, tuple[int, Optional[int]]]:
+        rows = self._db.execute(
+            "SELECT c.name, s.score, s.ilvl FROM samples s "
+            "JOIN characters c ON c.id = s.character_id "
+            "WHERE s.guild_id = ? AND s.ts = ("
+            "    SELECT MAX(ts) FROM samples WHERE character_id = s.character_id"
+            ")",
+            (guild_id,),
+        )
+        return {name: (score, ilvl) for name, score, ilvl in rows}
+
+    def _character_id(self, guild_id: int, name: str) -> int:
+        self._db.execute(
+            "INSERT OR IGNORE INTO characters (guild_id, name) VALUES (?, ?)", (guild_id, name)
+        )
+        return self._db.execute(
+            "SELECT id FROM characters WHERE guild_id = ? AND name = ?", (guild_id, name)
+        ).fetchone()[0]
+
+    def _prune(self, now: int) -> None:
+        self._last_prune = now
+        with self._db:
+            self._db.execute("DELETE FROM samples WHERE ts < ?", (now - MAX_AGE,))
+            guild_ids = [
+                row[0] for row in self._db.execute("SELECT DISTINCT guild_id FROM samples")
+            ]
+            for guild_id in guild_ids:
+                self._db.execute(
+                    "DELETE FROM samples WHERE guild_id = ? AND ts < ("
+                    "    SELECT ts FROM samples WHERE guild_id = ? "
+                    "    ORDER BY ts DESC LIMIT 1 OFFSET ?"
+                    ")",
+                    (guild_id, guild_id, MAX_SAMPLES_PER_GUILD),
+                )
+            self._db.execute(
+                "DELETE FROM characters WHERE id NOT IN (SELECT character_id FROM samples)"
+            )
+        # Pruned characters may have been remembered as unchanged
+        self._last.clear()
@@ -0,0 +1,191 @@
+import functools
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+import aiohttp
+
+
+class Summary:
+    """Running count, total, maximum and last value of a timing, in seconds."""
+
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "average": self.average,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class Metrics:
+    """
+    In-memory counters and timings of the cog's background work.
+
+    Nothing here is persisted, everything starts from zero when the cog is loaded.
+    """
+
+    def __init__(self):
+        self.loops: Dict[str, Summary] = defaultdict(Summary)
+        self.loop_overruns: Dict[str, int] = defaultdict(int)
+        self.loop_errors: Dict[str, int] = defaultdict(int)
+        # "scope.step": timing across every guild
+        self.steps: Dict[str, Summary] = defaultdict(Summary)
+        # guild ID: {"scope.step": seconds} of the last run
+        self.guild_steps: Dict[int, Dict[str, float]] = defaultdict(dict)
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.started = time.time()
+
+    def observe_tick(self, loop: str, seconds: float, interval: float, failed: bool) -> None:
+        self.loops[loop].observe(seconds)
+        if interval and seconds > interval:
+            self.loop_overruns[loop] += 1
+        if failed:
+            self.loop_errors[loop] += 1
+
+    @contextmanager
+    def timer(self, scope: str, step: str, guild_id: Optional[int] = None) -> Iterator[None]:
+        """Time the body of a ``with`` block as one step of some work."""
+        key = f"{scope}.{step}"
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.steps[key].observe(seconds)
+            if guild_id is not None:
+                self.guild_steps[guild_id][key] = seconds
+
+    def count_request(self, api: str, amount: int = 1) -> None:
+        self.requests[api] += amount
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """A trace config that counts every request made by a session, by host."""
+
+        async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams):
+            self.count_request(params.url.host or "unknown")
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        return trace_config
+
+    def snapshot(self, caches: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Everything recorded so far as plain data.
+
+        :param caches: Name to cache, every cache needs ``__len__``, ``hits``, ``misses``,
+            ``coalesced`` and ``hit_ratio``.
+        """
+        return {
+            "uptime": time.time() - self.started,
+            "loops": {
+                loop: {
+                    **summary.to_dict(),
+                    "overruns": self.loop_overruns[loop],
+                    "errors": self.loop_errors[loop],
+                }
+                for loop, summary in self.loops.items()
+            },
+            "steps": {step: summary.to_dict() for step, summary in self.steps.items()},
+            "guild_steps": {str(guild_id): steps for guild_id, steps in self.guild_steps.items()},
+            "requests": dict(self.requests),
+            "caches": {
+                name: {
+                    "size": len(cache),
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "coalesced": cache.coalesced,
+                    "hit_ratio": cache.hit_ratio,
+                }
+                for name, cache in caches.items()
+            },
+        }
+
+
+def to_prometheus(snapshot: Dict[str, Any]) -> str:
+    """Format a ``Metrics.snapshot`` in the Prometheus text exposition format."""
+    lines = [
+        "# TYPE wowtools_uptime_seconds gauge",
+        f"wowtools_uptime_seconds {snapshot['uptime']:.3f}",
+    ]
+
+    def summary(name: str, label: str, values: Dict[str, Dict[str, float]]) -> None:
+        lines.append(f"# TYPE wowtools_{name}_seconds summary")
+        for key, timing in values.items():
+            lines.append(f'wowtools_{name}_seconds_count{{{label}="{key}"}} {timing["count"]}')
+            lines.append(f'wowtools_{name}_seconds_sum{{{label}="{key}"}} {timing["total"]:.6f}')
+        lines.append(f"# TYPE wowtools_{name}_max_seconds gauge")
+        for key, timing in values.items():
+            lines.append(f'wowtools_{name}_max_seconds{{{label}="{key}"}} {timing["max"]:.6f}')
+
+    summary("loop_tick", "loop", snapshot["loops"])
+    for counter in ("overruns", "errors"):
+        lines.append(f"# TYPE wowtools_loop_{counter}_total counter")
+        for loop, timing in snapshot["loops"].items():
+            lines.append(f'wowtools_loop_{counter}_total{{loop="{loop}"}} {timing[counter]}')
+    summary("step", "step", snapshot["steps"])
+
+    lines.append("# TYPE wowtools_http_requests_total counter")
+    for api, count in snapshot["requests"].items():
+        lines.append(f'wowtools_http_requests_total{{api="{api}"}} {count}')
+
+    lines.append("# TYPE wowtools_cache_lookups_total counter")
+    for name, cache in snapshot["caches"].items():
+        for result in ("hits", "misses", "coalesced"):
+            lines.append(
+                f'wowtools_cache_lookups_total{{cache="{name}",result="{result}"}} {cache[result]}'
+            )
+    lines.append("# TYPE wowtools_cache_size gauge")
+    for name, cache in snapshot["caches"].items():
+        lines.append(f'wowtools_cache_size{{cache="{name}"}} {cache["size"]}')
+    return "\n".join(lines) + "\n"
+
+
+def timed_loop(name: str) -> Callable:
+    """
+    Record every run of a ``tasks.loop`` body in the cog's ``metrics``.
+
+    Goes below the ``@tasks.loop`` decorator. A run counts as an overrun when it takes longer
+    than the loop's interval.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = await func(self, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                loop = getattr(self, name)
+                interval = (
+                    (loop.hours or 0) * 3600 + (loop.minutes or 0) * 60 + (loop.seconds or 0)
+                )
+                self.metrics.observe_tick(name, time.perf_counter() - start, interval, failed)
+
+        return wrapper
+
+    return decorator
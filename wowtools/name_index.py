@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from rapidfuzz import fuzz, process
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+OBJ_TYPES = ("item", "spell")
+# Blizzard's search endpoints don't return more than this per page
+PAGE_SIZE = 1000
+# The index is saved every this many pages while it's being built, so a restart can carry on
+SAVE_EVERY = 25
+# Prefix matches looked at before picking the shortest one
+MAX_PREFIX_MATCHES = 500
+FUZZY_CUTOFF = 85
+
+
+def normalize(name: str) -> str:
+    """Lowercase, accent free and single spaced version of a name, used as the lookup key."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return " ".join(name.casefold().split())
+
+
+class _Lookup:
+    """Lookup structures for the names of one object type in one locale."""
+
+    def __init__(self, names: Dict[str, str]):
+        # normalized name: (display name, IDs sharing that name from lowest to highest)
+        self.by_key: Dict[str, Tuple[str, List[int]]] = {}
+        for obj_id, name in sorted(names.items(), key=lambda i: int(i[0])):
+            key = normalize(name)
+            if not key:
+                continue
+            self.by_key.setdefault(key, (name, []))[1].append(int(obj_id))
+        self.keys: List[str] = sorted(self.by_key)
+
+    def exact(self, query: str) -> Optional[Tuple[str, List[int]]]:
+        return self.by_key.get(normalize(query))
+
+    def prefixed(self, query: str, limit: int) -> List[str]:
+        key = normalize(query)
+        matches = []
+        index = bisect_left(self.keys, key)
+        while index < len(self.keys) and len(matches) < limit:
+            if not self.keys[index].startswith(key):
+                break
+            matches.append(self.keys[index])
+            index += 1
+        return matches
+
+    def find(self, query: str) -> Optional[Tuple[str, List[int]]]:
+        key = normalize(query)
+        if not key:
+            return None
+        if key in self.by_key:
+            return self.by_key[key]
+        prefixed = self.prefixed(key, MAX_PREFIX_MATCHES)
+        if prefixed:
+            return self.by_key[min(prefixed, key=len)]
+        containing = [name for name in self.keys if key in name]
+        if containing:
+            return self.by_key[min(containing, key=len)]
+        match = process.extractOne(key, self.keys, scorer=fuzz.WRatio, score_cutoff=FUZZY_CUTOFF)
+        return self.by_key[match[0]] if match else None
+
+    def complete(self, query: str, limit: int) -> List[str]:
+        key = normalize(query)
+        if not key:
+            return []
+        keys = self.prefixed(key, limit)
+        if len(keys) < limit:
+            fuzzy = process.extract(key, self.keys, scorer=fuzz.WRatio, limit=limit * 2)
+            keys.extend(match for match, __, __ in fuzzy if match not in keys)
+        return [self.by_key[key][0] for key in keys[:limit]]
+
+
+class NameIndex:
+    """
+    Local index of item and spell names, so resolving a name doesn't need a search request.
+
+    Built by paging through Blizzard's search endpoints by ID, and stored on the disk with
+    the highest ID seen, so later refreshes only fetch what was added since.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fetch: Callable[[str, int], Awaitable[List[dict]]],
+        locales: Sequence[str] = ("en_US",),
+    ):
+        """
+        :param path: Folder the index is stored in, one JSON file per object type.
+        :param fetch: Coroutine function that gets a page of search results for an object
+            type, starting after the given ID and ordered by ID.
+        :param locales: Locales to keep names of.
+        """
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.fetch = fetch
+        self.locales = tuple(locales)
+        # object type: {"updated": timestamp, "last_id": ID, "names": {locale: {ID: name}}}
+        self._data: Dict[str, dict] = {}
+        self._lookups: Dict[Tuple[str, str], _Lookup] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def is_ready(self, obj_type: str) -> bool:
+        return any(key[0] == obj_type for key in self._lookups)
+
+    async def load(self) -> None:
+        for obj_type in OBJ_TYPES:
+            try:
+                data = json.loads(await asyncio.to_thread(self._file(obj_type).read_text))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                log.warning(f"Could not read the {obj_type} name index.", exc_info=True)
+                continue
+            self._data[obj_type] = data
+            await asyncio.to_thread(self._build_lookups, obj_type)
+
+    async def refresh(self, obj_type: str) -> int:
+        """
+        Fetch every object added since the last refresh.
+
+        :return: How many objects were added.
+        """
+        lock = self._locks.setdefault(obj_type, asyncio.Lock())
+        async with lock:
+            data = self._data.setdefault(
+                obj_type,
+                {"updated": 0, "last_id": 0, "names": {locale: {} for locale in self.locales}},
+            )
+            added = 0
+            pages = 0
+            while True:
+                results = await self.fetch(obj_type, data["last_id"])
+                for result in results:
+                    obj_id = result["data"]["id"]
+                    names = result["data"].get("name") or {}
+                    for locale in self.locales:
+                        if names.get(locale):
+                            data["names"].setdefault(locale, {})[str(obj_id)] = names[locale]
+                    data["last_id"] = max(data["last_id"], obj_id)
+                added += len(results)
+                pages += 1
+                if len(results) < PAGE_SIZE:
+                    break
+                if pages % SAVE_EVERY == 0:
+                    await self._save(obj_type)
+            data["updated"] = time.time()
+            await self._save(obj_type)
+            if added or not self.is_ready(obj_type):
+                await asyncio.to_thread(self._build_lookups, obj_type)
+            log.debug(f"{obj_type.capitalize()} name index refreshed, {added} added.")
+            return added
+
+    async def find(
+        self, obj_type: str, query: str, locale: str = "en_US"
+    ) -> Optional[Tuple[str, List[int]]]:
+        """
+        Find the object a user most likely means, like the search endpoints would.
+
+        Tries an exact match first, then the shortest name starting with the query, then the
+        shortest name containing it, and finally a fuzzy match to allow for typos.
+
+        :return: The object's name and the IDs of every object with that name, or None.
+        """
+        lookup = self._lookups.get((obj_type, locale))
+        if lookup is None:
+            return None
+        return await asyncio.to_thread(lookup.find, query)
+
+    def exact(
+        self, obj_type: str, query: str, locale: str = "en_US"
+    ) -> Optional[Tuple[str, List[int]]]:
+        """Get the name and IDs of objects named exactly ``query``, ignoring case and accents."""
+        lookup = self._lookups.get((obj_type, locale))
+        return lookup.exact(query) if lookup else None
+
+    async def complete(
+        self, obj_type: str, query: str, locale: str = "en_US", limit: int = 25
+    ) -> List[str]:
+        """Names for autocompleting ``query``, prefix matches first."""
+        lookup = self._lookups.get((obj_type, locale))
+        if lookup is None:
+            return []
+        return await asyncio.to_thread(lookup.complete, query, limit)
+
+    def _build_lookups(self, obj_type: str) -> None:
+        for locale, names in self._data[obj_type]["names"].items():
+            if locale in self.locales:
+                self._lookups[(obj_type, locale)] = _Lookup(names)
+
+    def _file(self, obj_type: str) -> Path:
+        return self.path / f"{obj_type}.json"
+
+    async def _save(self, obj_type: str) -> None:
+        # Serialized in the thread too, the item index is tens of megabytes. Only ``refresh``
+        # changes the data, and it waits for this to finish
+        await asyncio.to_thread(self._write, obj_type, self._data[obj_type])
+
+    def _write(self, obj_type: str, data: dict) -> None:
+        file = self._file(obj_type)
+        tmp_file = file.with_suffix(".tmp")
+        try:
+            tmp_file.write_text(json.dumps(data))
+            os.replace(tmp_file, file)
+        except OSError:
+            log.warning(f"Could not save the {obj_type} name index.", exc_info=True)
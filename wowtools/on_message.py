@@ -109,6 +109,18 @@ class OnMessage:
             description_method = method[2]
             obj_type = method[3]
 
+            if self.name_index.is_ready(obj_type):
+                match = self.name_index.exact(obj_type, search_string)
+                if not match:
+                    continue
+                result_name, result_ids = match
+                embed = await self.get_or_fetch_embed(
+                    media_method, description_method, result_ids[0], result_name, obj_type
+                )
+                embeds.append(embed)
+                continue
+
+            # The name index hasn't been built yet
             try:
                 await self.limiter.acquire()
                 search_results = await search_method(search_params)
@@ -118,31 +130,34 @@ class OnMessage:
             for result in search_results["results"]:
                 if result["data"]["name"]["en_US"].lower() != search_string.lower():
                     continue
-                result_id = result["data"]["id"]
                 embed = await self.get_or_fetch_embed(
-                    media_method, description_method, result, result_id, obj_type
+                    media_method,
+                    description_method,
+                    result["data"]["id"],
+                    result["data"]["name"]["en_US"],
+                    obj_type,
                 )
 
                 embeds.append(embed)
                 break
 
     async def get_or_fetch_embed(
-        self, media_method, description_method, result, result_id, obj_type
+        self, media_method, description_method, result_id, result_name, obj_type
     ):
-        if self.on_message_cache.get(result_id):
-            embed = self.on_message_cache.get(result_id)
-        else:
-            embed = await self.make_embed(description_method, media_method, result, obj_type)
-            self.on_message_cache[result_id] = embed
-        return embed
+        return await self.embed_cache.get_or_fetch(
+            (obj_type, result_id, "en_US"),
+            lambda: self.make_embed(
+                description_method, media_method, result_id, result_name, obj_type
+            ),
+        )
 
-    async def make_embed(self, description_method, media_method, result, obj_type):
-        result_description = await description_method(result["data"]["id"])
-        result_icon = await media_method(result["data"]["id"])
+    async def make_embed(self, description_method, media_method, result_id, result_name, obj_type):
+        result_description = await description_method(result_id)
+        result_icon = await media_method(result_id)
         embed = discord.Embed(
-            title=result["data"]["name"]["en_US"],
+            title=result_name,
             description=self.generate_description(result_description, obj_type),
-            url=f"https://www.wowhead.com/{obj_type}={result['data']['id']}",
+            url=f"https://www.wowhead.com/{obj_type}={result_id}",
             colour=(
                 await self.get_spell_colour(result_icon["assets"][0]["value"])
                 if obj_type == "spell"
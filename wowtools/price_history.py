@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+# One fixed size little endian record per item per snapshot, so a file can be read and
+# filtered as a single array
+RECORD = np.dtype(
+    [
+        ("ts", "<u4"),
+        ("item_id", "<u4"),
+        ("min_price", "<i8"),
+        ("median", "<i8"),
+        ("quantity", "<u4"),
+    ]
+)
+# Older records are dropped
+MAX_AGE = 30 * 24 * 60 * 60
+# How often old records are pruned, in seconds
+PRUNE_INTERVAL = 24 * 60 * 60
+
+
+class PriceHistory:
+    """
+    Price history of items, in one append-only file of binary records per auction house.
+
+    Records are only ever appended, reading an item's history reads the whole file as one
+    array and filters it, which is fast for the few megabytes a month of watched items takes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # auction house file: when it was last pruned
+        self._last_prune: Dict[Path, float] = {}
+
+    async def append(
+        self,
+        region: str,
+        key: Union[int, str],
+        ts: int,
+        item_ids: np.ndarray,
+        min_prices: np.ndarray,
+        medians: np.ndarray,
+        quantities: np.ndarray,
+    ) -> None:
+        """Record the prices of items in an auction house's snapshot, leaving out unlisted ones."""
+        records = np.zeros(len(item_ids), dtype=RECORD)
+        records["ts"] = ts
+        records["item_id"] = item_ids
+        records["min_price"] = min_prices
+        records["median"] = medians
+        records["quantity"] = quantities
+        records = records[records["quantity"] > 0]
+        await asyncio.to_thread(self._append, self._file(region, key), records)
+
+    async def get(self, region: str, key: Union[int, str], item_id: int) -> np.ndarray:
+        """Get an item's records in an auction house, oldest first."""
+        return await asyncio.to_thread(self._get, self._file(region, key), item_id)
+
+    def _file(self, region: str, key: Union[int, str]) -> Path:
+        return self.path / f"{region.lower()}-{key}.bin"
+
+    def _append(self, file: Path, records: np.ndarray) -> None:
+        with self._lock:
+            with file.open("ab") as f:
+                records.tofile(f)
+            now = time.time()
+            if now - self._last_prune.get(file, 0) > PRUNE_INTERVAL:
+                self._prune(file, now)
+
+    def _get(self, file: Path, item_id: int) -> np.ndarray:
+        with self._lock:
+            try:
+                records = np.fromfile(file, dtype=RECORD)
+            except FileNotFoundError:
+                return np.zeros(0, dtype=RECORD)
+        # Records are appended in order, so this is already sorted by time
+        return records[records["item_id"] == item_id]
+
+    def _prune(self, file: Path, now: float) -> None:
+        self._last_prune[file] = now
+        records = np.fromfile(file, dtype=RECORD)
+        kept = records[records["ts"] >= now - MAX_AGE]
+        if len(kept) == len(records):
+            return
+        tmp_file = file.with_suffix(".tmp")
+        try:
+            kept.tofile(tmp_file)
+            tmp_file.replace(file)
+        except OSError:
+            log.warning(f"Could not prune the price history in {file}.", exc_info=True)
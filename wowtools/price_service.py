@@ -0,0 +1,156 @@
+from typing import Callable, Dict, NamedTuple, Optional
+
+from aiolimiter import AsyncLimiter
+from aiowowapi import WowApi
+
+from .auctions import AuctionSnapshotStore, ItemPrice, find_item_price
+from .cache import TTLCache
+from .exceptions import InvalidBlizzardAPI, ItemNotFound, NoAuctionsFound, RealmNotFound
+from .metrics import Metrics
+from .name_index import NameIndex, normalize
+from .price_stats import PriceStats, price_stats
+from .realm_index import ConnectedRealmIndex
+
+# Lookups of the same item on the same realm within this many seconds share one result
+PRICE_CACHE_TTL = 60
+# Item icons practically never change
+ICON_CACHE_TTL = 24 * 60 * 60
+
+
+class PriceResult(NamedTuple):
+    region: str
+    connected_realm_id: int
+    item_id: int
+    item_name: str
+    price: ItemPrice
+    # Only for items with more than one unit listed
+    stats: Optional[PriceStats]
+    # Found on the region wide commodity auction house instead of the realm's
+    commodity: bool
+    icon_url: Optional[str]
+
+
+class PriceService:
+    """
+    Looks up the current auction price of an item on a realm, for every price command.
+
+    Concurrent lookups of the same item on the same connected realm are collapsed into one,
+    and the result is reused for ``PRICE_CACHE_TTL`` seconds.
+    """
+
+    def __init__(
+        self,
+        get_client: Callable[[str], Optional[WowApi]],
+        limiter: AsyncLimiter,
+        metrics: Metrics,
+        snapshots: AuctionSnapshotStore,
+        realm_index: ConnectedRealmIndex,
+        name_index: NameIndex,
+    ):
+        self.get_client = get_client
+        self.limiter = limiter
+        self.metrics = metrics
+        self.snapshots = snapshots
+        self.realm_index = realm_index
+        self.name_index = name_index
+        self.cache = TTLCache(ttl=PRICE_CACHE_TTL)
+        self.icons = TTLCache(ttl=ICON_CACHE_TTL)
+
+    async def lookup(self, region: str, realm: str, item: str) -> PriceResult:
+        """
+        Get the current price of an item.
+
+        :param realm: Slug or name of the realm in any locale.
+        :param item: Name of the item, doesn't have to be exact.
+        :raises InvalidBlizzardAPI: If there's no API client for the region.
+        :raises RealmNotFound: If there's no such realm in the region.
+        :raises ItemNotFound: If no item has a name like that.
+        :raises NoAuctionsFound: If the item isn't listed on the realm or as a commodity.
+        """
+        region = region.lower()
+        if not self.get_client(region):
+            raise InvalidBlizzardAPI
+        c_realm_id = await self.realm_index.get(region, realm)
+        if not c_realm_id:
+            raise RealmNotFound
+        return await self.cache.get_or_fetch(
+            (region, c_realm_id, normalize(item)),
+            lambda: self._lookup(region, c_realm_id, item),
+        )
+
+    async def find_items(self, region: str, item: str) -> Dict[int, str]:
+        """
+        Find the item a name most likely means.
+
+        :return: The IDs of every item sharing that item's name, with the name. Empty if no
+            item matches.
+        """
+        if self.name_index.is_ready("item"):
+            match = await self.name_index.find("item", item)
+            if not match:
+                return {}
+            item_name, item_ids = match
+            return {item_id: item_name for item_id in item_ids}
+
+        # The name index hasn't been built yet
+        client = self.get_client(region)
+        if not client:
+            raise InvalidBlizzardAPI
+        async with client as wow_client:
+            await self.limiter.acquire()
+            self.metrics.count_request("blizzard")
+            items = await wow_client.Retail.GameData.get_item_search(
+                {"name.en_US": item, "_pageSize": 1000}
+            )
+
+        found_items: Dict[int, str] = {}
+        for result in items["results"]:
+            item_id: int = result["data"]["id"]
+            item_name: str = result["data"]["name"]["en_US"]
+            if found_items:
+                if item_name in found_items.values():
+                    found_items[item_id] = item_name
+            elif item.lower() in item_name.lower():
+                found_items[item_id] = item_name
+        return found_items
+
+    async def get_icon_url(self, region: str, item_id: int) -> Optional[str]:
+        return await self.icons.get_or_fetch(
+            (region, item_id), lambda: self._fetch_icon_url(region, item_id)
+        )
+
+    async def _lookup(self, region: str, c_realm_id: int, item: str) -> PriceResult:
+        found_items = await self.find_items(region, item)
+        if not found_items:
+            raise ItemNotFound
+
+        commodity = False
+        found = find_item_price(await self.snapshots.get_auctions(region, c_realm_id), found_items)
+        if found is None:
+            commodity = True
+            found = find_item_price(await self.snapshots.get_commodities(region), found_items)
+        if found is None:
+            raise NoAuctionsFound
+        found_item_id, item_price = found
+
+        return PriceResult(
+            region=region,
+            connected_realm_id=c_realm_id,
+            item_id=found_item_id,
+            item_name=found_items[found_item_id],
+            price=item_price,
+            stats=price_stats(item_price) if item_price.quantity > 1 else None,
+            commodity=commodity,
+            icon_url=await self.get_icon_url(region, found_item_id),
+        )
+
+    async def _fetch_icon_url(self, region: str, item_id: int) -> Optional[str]:
+        client = self.get_client(region)
+        if not client:
+            raise InvalidBlizzardAPI
+        async with client as wow_client:
+            await self.limiter.acquire()
+            self.metrics.count_request("blizzard")
+            item_media = await wow_client.Retail.GameData.get_item_media(item_id=item_id)
+        assets = item_media.get("assets")
+        return assets[0]["value"] if assets else None
@@ -0,0 +1,120 @@
+from typing import Dict, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+from .auctions import CommodityIndex, ItemPrice
+
+PERCENTILES = (10, 25, 75, 90)
+# Amounts the cost of buying is shown for, as long as that many are listed
+BUY_AMOUNTS = (5, 20, 100, 1000)
+
+
+class PriceStats(NamedTuple):
+    min_price: int
+    # Of every listed unit, not of every price point
+    median: int
+    mean: int
+    quantity: int
+    # (percentile, unit price)
+    percentiles: Tuple[Tuple[int, int], ...]
+    # (units, total cost of buying the cheapest ones)
+    buy_costs: Tuple[Tuple[int, int], ...]
+
+
+def price_stats(
+    item_price: ItemPrice,
+    percentiles: Sequence[int] = PERCENTILES,
+    buy_amounts: Sequence[int] = BUY_AMOUNTS,
+) -> PriceStats:
+    """
+    Quantity weighted statistics of an item's listings.
+
+    Works on the price points rather than on single units, so a commodity with tens of
+    thousands of units listed at a few hundred prices costs a few hundred of everything.
+    """
+    points = np.array(item_price.histogram, dtype=np.int64).reshape(-1, 2)
+    prices = points[:, 0]
+    quantities = points[:, 1]
+    # Units listed at this price point or cheaper, and what buying all of them costs
+    cumulative = np.cumsum(quantities)
+    cumulative_cost = np.cumsum(prices * quantities)
+    total = int(cumulative[-1])
+
+    # The unit at each rank, counting from 1, is in the first price point that reaches it
+    ranks = np.maximum(np.ceil(np.asarray(tuple(percentiles) + (50,)) / 100 * total), 1)
+    ranked_prices = prices[np.searchsorted(cumulative, ranks)]
+
+    amounts = np.asarray([amount for amount in buy_amounts if amount <= total], dtype=np.int64)
+    # The last price point needed for each amount is only partly bought
+    last = np.searchsorted(cumulative, amounts)
+    bought_before = np.where(last > 0, cumulative[last - 1], 0)
+    cost_before = np.where(last > 0, cumulative_cost[last - 1], 0)
+    costs = cost_before + (amounts - bought_before) * prices[last]
+
+    return PriceStats(
+        min_price=int(prices[0]),
+        median=int(ranked_prices[-1]),
+        mean=int(round(cumulative_cost[-1] / total)),
+        quantity=total,
+        percentiles=tuple(zip(percentiles, ranked_prices[:-1].tolist())),
+        buy_costs=tuple(zip(amounts.tolist(), costs.tolist())),
+    )
+
+
+class BulkPrices(NamedTuple):
+    # All aligned with the item IDs asked for, and 0 where an item isn't listed
+    min_prices: np.ndarray
+    medians: np.ndarray
+    quantities: np.ndarray
+
+
+def bulk_price_stats(
+    items: Union[Dict[int, ItemPrice], CommodityIndex], item_ids: np.ndarray
+) -> BulkPrices:
+    """
+    Minimum price, median and quantity of many items of a snapshot at once.
+
+    The price points of every item are treated as one segment of a single pair of price and
+    quantity arrays, so everything is computed in the same few vectorized passes no matter how
+    many items are asked for. A ``CommodityIndex`` already is such a pair of arrays.
+    """
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    if isinstance(items, CommodityIndex):
+        index_ids = np.frombuffer(items.item_ids, dtype=np.int64)
+        offsets = np.frombuffer(items.offsets, dtype=np.int64)
+        prices = np.frombuffer(items.prices, dtype=np.int64)
+        quantities = np.frombuffer(items.quantities, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(index_ids, item_ids), max(len(index_ids) - 1, 0))
+        listed = index_ids[positions] == item_ids if len(index_ids) else item_ids < 0
+        starts = np.where(listed, offsets[positions], 0)
+        ends = np.where(listed, offsets[positions + 1], 0)
+    else:
+        histograms = [
+            items[item_id].histogram if item_id in items else () for item_id in item_ids.tolist()
+        ]
+        lengths = np.fromiter(map(len, histograms), dtype=np.int64, count=len(histograms))
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        listed = lengths > 0
+        points = np.array(
+            [point for histogram in histograms for point in histogram], dtype=np.int64
+        ).reshape(-1, 2)
+        prices = points[:, 0]
+        quantities = points[:, 1]
+
+    if not len(prices):
+        empty = np.zeros(len(item_ids), dtype=np.int64)
+        return BulkPrices(empty, empty.copy(), empty.copy())
+
+    # cumulative[i] is how many units are listed in the price points before i
+    cumulative = np.concatenate(([0], np.cumsum(quantities)))
+    totals = cumulative[ends] - cumulative[starts]
+    # The median unit of each segment, counting from 1 like ``price_stats`` does
+    ranks = cumulative[starts] + np.maximum((totals + 1) // 2, 1)
+    median_positions = np.clip(np.searchsorted(cumulative, ranks) - 1, 0, len(prices) - 1)
+    first_positions = np.minimum(starts, len(prices) - 1)
+    return BulkPrices(
+        min_prices=np.where(listed, prices[first_positions], 0),
+        medians=np.where(listed, prices[median_positions], 0),
+        quantities=np.where(listed, totals, 0),
+    )
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .auctions import AuctionSnapshot
+from .price_stats import BulkPrices
+
+MAX_WATCHES = 25
+
+
+class PriceAlert(NamedTuple):
+    user_id: int
+    watch: dict
+    min_price: int
+    quantity: int
+
+
+class _WatchGroup:
+    """Every watch on one auction house, as parallel arrays."""
+
+    def __init__(self, watches: List[Tuple[int, dict]]):
+        self.watches = watches
+        item_ids = np.array([watch["item_id"] for __, watch in watches], dtype=np.int64)
+        # Each item's prices are only computed once, however many people watch it
+        self.item_ids, self.inverse = np.unique(item_ids, return_inverse=True)
+        self.thresholds = np.array([watch["threshold"] for __, watch in watches], dtype=np.int64)
+        self.below = np.array([watch["below"] for __, watch in watches], dtype=bool)
+        self.triggered = np.array([watch["triggered"] for __, watch in watches], dtype=bool)
+
+
+class PriceWatchlist:
+    """
+    Every user's price watches, grouped by auction house.
+
+    A watch is a dict stored in the user's config:
+    ``{"id", "item_id", "name", "region", "key", "realm", "threshold", "below", "triggered"}``,
+    where ``key`` is a connected realm ID or ``auctions.COMMODITIES``. A watch alerts once when
+    its item crosses the threshold, and again only after it went back first.
+    """
+
+    def __init__(self):
+        self._groups: Dict[Tuple[str, Union[int, str]], _WatchGroup] = {}
+        # auction house: Last-Modified of the snapshot that was last evaluated
+        self._evaluated: Dict[Tuple[str, Union[int, str]], Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(group.watches) for group in self._groups.values())
+
+    def load(self, all_users: Dict[int, dict]) -> None:
+        """(Re)build the watch groups from ``Config.all_users``."""
+        watches = defaultdict(list)
+        for user_id, user_config in all_users.items():
+            for watch in user_config.get("price_watches", []):
+                watches[(watch["region"], watch["key"])].append((user_id, watch))
+        self._groups = {key: _WatchGroup(group) for key, group in watches.items()}
+
+    def auction_houses(self) -> List[Tuple[str, Union[int, str]]]:
+        return list(self._groups)
+
+    def item_ids(self, region: str, key: Union[int, str]) -> np.ndarray:
+        """Every item watched in an auction house, sorted and without duplicates."""
+        return self._groups[(region, key)].item_ids
+
+    def is_new(self, snapshot: AuctionSnapshot) -> bool:
+        """Whether a snapshot wasn't evaluated yet."""
+        key = (snapshot.region, snapshot.key)
+        return key in self._groups and (
+            key not in self._evaluated or self._evaluated[key] != snapshot.last_modified
+        )
+
+    def evaluate(
+        self, snapshot: AuctionSnapshot, prices: BulkPrices
+    ) -> Tuple[List[PriceAlert], List[Tuple[int, int, bool]]]:
+        """
+        Check every watch on a snapshot's auction house in one pass.
+
+        :param prices: Prices of ``item_ids`` of the auction house in the snapshot.
+        :return: The alerts to send, and the (user ID, watch ID, triggered) of every watch
+            whose state changed and has to be saved.
+        """
+        key = (snapshot.region, snapshot.key)
+        self._evaluated[key] = snapshot.last_modified
+        group = self._groups.get(key)
+        if group is None:
+            return [], []
+
+        min_prices = prices.min_prices[group.inverse]
+        quantities = prices.quantities[group.inverse]
+        crossed = (quantities > 0) & np.where(
+            group.below, min_prices <= group.thresholds, min_prices >= group.thresholds
+        )
+        fired = crossed & ~group.triggered
+        changed = crossed != group.triggered
+        group.triggered = crossed
+
+        alerts = []
+        for index in np.flatnonzero(fired).tolist():
+            user_id, watch = group.watches[index]
+            alerts.append(
+                PriceAlert(user_id, watch, int(min_prices[index]), int(quantities[index]))
+            )
+        state = []
+        for index in np.flatnonzero(changed).tolist():
+            user_id, watch = group.watches[index]
+            watch["triggered"] = bool(crossed[index])
+            state.append((user_id, watch["id"], watch["triggered"]))
+        return alerts, state
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+
+class PvPStore:
+    """
+    PvP scoreboard state of every guild, kept in memory and in one JSON file per guild.
+
+    A guild's state has two keys:
+
+    - ``snapshot``: the last finished scoreboard, or None.
+    - ``progress``: the refresh that is currently being built, or None. It holds the members
+      that still need to be checked, so an interrupted refresh can carry on where it stopped.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._states: Dict[int, dict] = {}
+
+    async def load(self, guild_id: int) -> dict:
+        """Get a guild's state. The returned dict is shared, call ``save`` after changing it."""
+        if guild_id not in self._states:
+            self._states[guild_id] = await asyncio.to_thread(self._read, guild_id)
+        return self._states[guild_id]
+
+    async def save(self, guild_id: int) -> None:
+        # Serialize here so the state can't change while the thread is writing it
+        data = json.dumps(self._states[guild_id])
+        await asyncio.to_thread(self._write, guild_id, data)
+
+    def save_now(self, guild_id: int) -> None:
+        """Blocking version of ``save``, for when the event loop can't be awaited anymore."""
+        if guild_id in self._states:
+            self._write(guild_id, json.dumps(self._states[guild_id]))
+
+    async def unfinished(self) -> List[int]:
+        """IDs of guilds with a refresh that was interrupted before it finished."""
+        guild_ids = []
+        for file in self.path.glob("*.json"):
+            if not file.stem.isdigit():
+                continue
+            state = await self.load(int(file.stem))
+            if state["progress"] is not None:
+                guild_ids.append(int(file.stem))
+        return guild_ids
+
+    def _file(self, guild_id: int) -> Path:
+        return self.path / f"{guild_id}.json"
+
+    def _read(self, guild_id: int) -> dict:
+        try:
+            return json.loads(self._file(guild_id).read_text())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            log.warning(f"Could not read the PvP scoreboard state of {guild_id}.", exc_info=True)
+        return {"snapshot": None, "progress": None}
+
+    def _write(self, guild_id: int, data: str) -> None:
+        file = self._file(guild_id)
+        tmp_file = file.with_suffix(".tmp")
+        try:
+            tmp_file.write_text(data)
+            # Replacing is atomic, so a crash mid-write never leaves a half written state behind
+            os.replace(tmp_file, file)
+        except OSError:
+            log.warning(f"Could not save the PvP scoreboard state of {guild_id}.", exc_info=True)
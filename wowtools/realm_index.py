@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+log = logging.getLogger("red.karlo-cogs.wowtools")
+
+# How often the connected realms of a region are fetched again, in seconds. Kept well under the
+# daily refresh loop, so a region refreshed on one run is already stale on the next one
+MAX_AGE = 20 * 60 * 60
+
+
+class ConnectedRealmIndex:
+    """
+    Maps realm slugs and every localized realm name to connected realm IDs, per region.
+
+    The index is kept on the disk so resolving a realm never needs a request,
+    not even right after the cog is loaded. Each region is fetched again after ``MAX_AGE``.
+    """
+
+    def __init__(self, path: Path, fetch: Callable[[str], Awaitable[dict]]):
+        """
+        :param path: JSON file the index is stored in.
+        :param fetch: Coroutine function that gets a region's connected realms search results.
+        """
+        self.path = path
+        self.fetch = fetch
+        # region: {"updated": timestamp, "realms": {realm slug or lowercase name: ID}}
+        self._regions: Dict[str, dict] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def load(self) -> None:
+        try:
+            data = await asyncio.to_thread(self.path.read_text)
+            self._regions = json.loads(data)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            log.warning("Could not read the connected realm index.", exc_info=True)
+
+    def is_stale(self, region: str) -> bool:
+        region_index = self._regions.get(region.lower())
+        return region_index is None or time.time() - region_index["updated"] > MAX_AGE
+
+    async def get(self, region: str, realm: str) -> Optional[int]:
+        """
+        Get the connected realm ID of a realm.
+
+        :param region: Region of the realm.
+        :param realm: Slug or name of the realm in any locale, case insensitive.
+        :return: The connected realm ID, or None if there's no such realm in the region.
+        """
+        region = region.lower()
+        if region not in self._regions:
+            await self.refresh(region)
+        return self._lookup(region, realm)
+
+    async def refresh(self, region: str, force: bool = False) -> None:
+        """Fetch a region's connected realms again, unless that was just done."""
+        region = region.lower()
+        lock = self._locks.setdefault(region, asyncio.Lock())
+        async with lock:
+            # Someone else may have refreshed the region while this was waiting for the lock
+            if not force and not self.is_stale(region):
+                return
+            results = await self.fetch(region)
+            realms: Dict[str, int] = {}
+            for result in results["results"]:
+                c_realm_data = result["data"]
+                for realm in c_realm_data["realms"]:
+                    realms[realm["slug"]] = c_realm_data["id"]
+                    for name in realm["name"].values():
+                        if name:
+                            realms[name.lower()] = c_realm_data["id"]
+            self._regions[region] = {"updated": time.time(), "realms": realms}
+            await self._save()
+            log.debug(f"Connected realm index of {region} refreshed, {len(realms)} names.")
+
+    def _lookup(self, region: str, realm: str) -> Optional[int]:
+        realms: Dict[str, int] = self._regions.get(region, {}).get("realms", {})
+        realm = realm.strip().lower()
+        return realms.get(realm) or realms.get(realm.replace(" ", "-"))
+
+    async def _save(self) -> None:
+        data = json.dumps(self._regions)
+        await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: str) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            log.warning("Could not save the connected realm index.", exc_info=True)
@@ -0,0 +1,324 @@
+import io
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageColor, ImageDraw, ImageFilter, ImageFont
+
+# Everything in here runs inside a worker process, so it should only depend on plain data
+# that can be pickled and must not touch the bot, the event loop or Config.
+
+GLOW_RADIUS = 5
+# Gaussian blur doesn't reach further than about three times its radius
+GLOW_PADDING = GLOW_RADIUS * 3
+GLOW_MIN_ILVL = 679  # This is whatever the color for the highest ilvl is
+ROW_COUNT = 10
+ROW_HEIGHT = 75
+
+GRAPH_SIZE = (900, 400)
+# left, top, right, bottom
+GRAPH_PLOT_BOX = (90, 70, 870, 350)
+GRAPH_BACKGROUND = (43, 45, 49)
+GRAPH_GRID = (78, 80, 88)
+GRAPH_TEXT = (219, 222, 225)
+GRAPH_LINE = (255, 128, 0)
+
+# One renderer per worker process, so fonts, backgrounds and glow tiles survive between renders
+_renderers: Dict[str, "ScoreboardRenderer"] = {}
+
+
+class ScoreboardRenderer:
+    """Draws scoreboard images, reusing fonts, backgrounds and glow tiles between renders."""
+
+    def __init__(self, data_path: Path, max_glow_tiles: int = 256):
+        self.data_path = data_path
+        self.font = ImageFont.truetype(str(data_path / "Roboto-Bold.ttf"), 28)
+        self.small_font = ImageFont.truetype(str(data_path / "Roboto-Bold.ttf"), 18)
+        self.max_glow_tiles = max_glow_tiles
+        self._backgrounds: Dict[bool, Image.Image] = {}
+        self._glow_tiles: OrderedDict[Tuple[str, str], Image.Image] = OrderedDict()
+
+    def background(self, dev_guild: bool) -> Image.Image:
+        """Return a fresh copy of the background so the cached one is never drawn on."""
+        return self._background(dev_guild).copy()
+
+    def _background(self, dev_guild: bool) -> Image.Image:
+        if dev_guild not in self._backgrounds:
+            name = "scoreboard-jrk.png" if dev_guild else "scoreboard-df-s1.png"
+            with Image.open(self.data_path / name) as img:
+                self._backgrounds[dev_guild] = img.convert("RGBA")
+        return self._backgrounds[dev_guild]
+
+    def glow_tile(self, text: str, color: str) -> Image.Image:
+        """
+        Get a small transparent tile containing ``text`` with a blurred glow behind it.
+
+        The text is drawn at (GLOW_PADDING, GLOW_PADDING) inside the tile.
+        """
+        key = (text, color)
+        if key in self._glow_tiles:
+            self._glow_tiles.move_to_end(key)
+            return self._glow_tiles[key]
+
+        __, __, right, bottom = self.font.getbbox(text)
+        size = (right + GLOW_PADDING * 2, bottom + GLOW_PADDING * 2)
+        tile = Image.new("RGBA", size, (0, 0, 0, 0))
+        ImageDraw.Draw(tile).text((GLOW_PADDING, GLOW_PADDING), text, color, font=self.font)
+        tile = tile.filter(ImageFilter.GaussianBlur(GLOW_RADIUS))
+        ImageDraw.Draw(tile).text((GLOW_PADDING, GLOW_PADDING), text, color, font=self.font)
+
+        self._glow_tiles[key] = tile
+        if len(self._glow_tiles) > self.max_glow_tiles:
+            self._glow_tiles.popitem(last=False)
+        return tile
+
+    def render(
+        self,
+        tabulate_list: List[list],
+        avatars: List[Optional[bytes]],
+        dev_guild: bool = False,
+        base_path: Optional[str] = None,
+        changed_rows: Optional[Iterable[int]] = None,
+    ) -> bytes:
+        """
+        Render a scoreboard, either from scratch or by redrawing rows of a previous render.
+
+        :param base_path: A previously rendered scoreboard to draw on top of.
+        :param changed_rows: Indexes of the rows that differ from the previous render.
+            Only used together with ``base_path``, every other row is left as it was.
+        """
+        img = None
+        if base_path is not None and changed_rows is not None:
+            try:
+                with Image.open(base_path) as base:
+                    img = base.convert("RGBA")
+            except OSError:
+                img = None
+        if img is None:
+            img = self.background(dev_guild)
+            rows_to_draw = range(ROW_COUNT)
+        else:
+            rows_to_draw = sorted({index for index in changed_rows if index < ROW_COUNT})
+            background = self._background(dev_guild)
+            for index in rows_to_draw:
+                box = self._row_box(img, index, dev_guild)
+                img.paste(background.crop(box), box[:2])
+
+        draw = ImageDraw.Draw(img)
+        for index in rows_to_draw:
+            if index >= len(tabulate_list):
+                continue
+            avatar = avatars[index] if index < len(avatars) else None
+            self._draw_row(img, draw, tabulate_list[index], avatar, self._row_y(index, dev_guild))
+
+        img_obj = io.BytesIO()
+        img.save(img_obj, format="PNG")
+        return img_obj.getvalue()
+
+    def history_graph(
+        self, name: str, timestamps: List[int], scores: List[int], now: int
+    ) -> bytes:
+        """
+        Draw a character's score over time as a step line, continuing the last sample to ``now``.
+        """
+        img = Image.new("RGB", GRAPH_SIZE, GRAPH_BACKGROUND)
+        draw = ImageDraw.Draw(img)
+        left, top, right, bottom = GRAPH_PLOT_BOX
+
+        start = timestamps[0]
+        end = max(now, timestamps[-1] + 1)
+        low = min(scores)
+        high = max(scores)
+        if high == low:
+            low, high = low - 50, high + 50
+
+        def point(ts: int, score: int) -> Tuple[float, float]:
+            x = left + (ts - start) / (end - start) * (right - left)
+            y = bottom - (score - low) / (high - low) * (bottom - top)
+            return x, y
+
+        for score in (low, high):
+            __, y = point(start, score)
+            draw.line((left, y, right, y), GRAPH_GRID, width=1)
+            draw.text((left - 10, y), str(score), GRAPH_TEXT, font=self.small_font, anchor="rm")
+        for ts, anchor in ((start, "lt"), (end, "rt")):
+            label = time.strftime("%d %b %H:%M", time.gmtime(ts))
+            x, __ = point(ts, low)
+            draw.text((x, bottom + 10), label, GRAPH_TEXT, font=self.small_font, anchor=anchor)
+
+        line = [point(timestamps[0], scores[0])]
+        for ts, previous, score in zip(timestamps[1:], scores, scores[1:]):
+            line.append(point(ts, previous))
+            line.append(point(ts, score))
+        line.append(point(end, scores[-1]))
+        draw.line(line, GRAPH_LINE, width=3)
+
+        draw.text((left, 15), name, GRAPH_TEXT, font=self.font)
+
+        img_obj = io.BytesIO()
+        img.save(img_obj, format="PNG")
+        return img_obj.getvalue()
+
+    @staticmethod
+    def _row_y(index: int, dev_guild: bool) -> int:
+        return (100 if dev_guild else 25) + index * ROW_HEIGHT
+
+    def _row_box(self, img: Image.Image, index: int, dev_guild: bool) -> Tuple[int, int, int, int]:
+        # Everything a row draws (thumbnail, text and glow) stays inside this band
+        y = self._row_y(index, dev_guild)
+        return 0, y - 15, img.width, min(y - 15 + ROW_HEIGHT, img.height)
+
+    def _draw_row(
+        self,
+        img: Image.Image,
+        draw: ImageDraw.ImageDraw,
+        character: list,
+        avatar: Optional[bytes],
+        y: int,
+    ) -> None:
+        x = 150
+        char_name = character[1]
+        score = character[2]
+        ilvl = character[6]
+
+        score_color = ImageColor.getcolor(character[3], "RGB")
+        class_color = ImageColor.getcolor(character[5], "RGB")
+        ilvl_color = get_ilvl_color(int(ilvl))
+
+        if avatar:
+            with Image.open(io.BytesIO(avatar)) as image:
+                img.paste(image.resize((65, 65)), (x - 79, y - 15))
+
+        draw.text((x, y), char_name, class_color, font=self.font)
+        if int(ilvl) >= GLOW_MIN_ILVL:
+            tile = self.glow_tile(ilvl, ilvl_color)
+            img.alpha_composite(tile, dest=(x + 225 - GLOW_PADDING, y - GLOW_PADDING))
+        else:
+            draw.text((x + 225, y), ilvl, ilvl_color, font=self.font)
+        draw.text((x + 300, y), score, score_color, font=self.font)
+
+
+def get_renderer(data_path: str) -> ScoreboardRenderer:
+    if data_path not in _renderers:
+        _renderers[data_path] = ScoreboardRenderer(Path(data_path))
+    return _renderers[data_path]
+
+
+def render_scoreboard(
+    tabulate_list: List[list],
+    avatars: List[Optional[bytes]],
+    data_path: str,
+    dev_guild: bool = False,
+    base_path: Optional[str] = None,
+    changed_rows: Optional[List[int]] = None,
+) -> bytes:
+    """
+    Draw the Mythic+ scoreboard image.
+
+    :param tabulate_list: Rows as returned by ``Scoreboard._get_dungeon_scores`` with images enabled.
+    :param avatars: Raw thumbnail bytes for each row, or None if the thumbnail couldn't be fetched.
+    :param data_path: Path to the cog's bundled data folder.
+    :param dev_guild: Whether to use the dev guild background.
+    :param base_path: Path to the previous render of this scoreboard, if there is one.
+    :param changed_rows: Rows that changed since ``base_path`` was rendered.
+    :return: PNG encoded image.
+    """
+    return get_renderer(data_path).render(
+        tabulate_list, avatars, dev_guild, base_path=base_path, changed_rows=changed_rows
+    )
+
+
+def render_history_graph(
+    name: str, timestamps: List[int], scores: List[int], data_path: str, now: int
+) -> bytes:
+    """
+    Draw a character's score history as returned by ``ScoreboardHistory.get``.
+
+    :return: PNG encoded image.
+    """
+    return get_renderer(data_path).history_graph(name, timestamps, scores, now)
+
+
+def get_ilvl_color(ilvl: int) -> str:
+    if ilvl >= 717:
+        return "#f16960"
+    elif ilvl >= 714:
+        return "#FF69B4"
+    elif ilvl >= 709:
+        return "#FFA500"
+    elif ilvl >= 705:
+        return "#b040c2"
+    elif ilvl >= 698:
+        return "#445bc2"
+    elif ilvl >= 692:
+        return "#00ff1a"
+    else:
+        return "#FFFFFF"
+
+
+def benchmark_render(data_path: str, iterations: int = 20) -> Dict[str, float]:
+    """
+    Time rendering a full scoreboard of high item level characters.
+
+    :return: Average milliseconds per scoreboard for the old full-canvas renderer and the
+        cached renderer.
+    """
+    avatar = io.BytesIO()
+    Image.new("RGB", (84, 84), (120, 60, 200)).save(avatar, format="JPEG")
+    avatars = [avatar.getvalue()] * 10
+    tabulate_list = [
+        [
+            f"{index + 1}.",
+            f"Character{index}",
+            str(3500 - index * 25),
+            "#ff8000",
+            "",
+            "#C41F3B",
+            str(720 - index * 3),
+        ]
+        for index in range(10)
+    ]
+
+    start = time.perf_counter()
+    for __ in range(iterations):
+        _render_full_canvas(tabulate_list, avatars, Path(data_path))
+    before = (time.perf_counter() - start) / iterations
+
+    renderer = ScoreboardRenderer(Path(data_path))
+    start = time.perf_counter()
+    for __ in range(iterations):
+        renderer.render(tabulate_list, avatars)
+    after = (time.perf_counter() - start) / iterations
+
+    return {"before": before * 1000, "after": after * 1000}
+
+
+def _render_full_canvas(
+    tabulate_list: List[list], avatars: List[Optional[bytes]], data_path: Path
+) -> bytes:
+    # The renderer as it was before ScoreboardRenderer, only kept as a baseline for
+    # benchmark_render. Loads everything on every call and blurs the whole canvas per glow.
+    img = Image.open(str(data_path / "scoreboard-df-s1.png"))
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.truetype(str(data_path / "Roboto-Bold.ttf"), 28)
+
+    x = 150
+    y = 25
+    for character, avatar in zip(tabulate_list[:10], avatars):
+        ilvl = character[6]
+        ilvl_color = get_ilvl_color(int(ilvl))
+        img.paste(Image.open(io.BytesIO(avatar)).resize((65, 65)), (x - 79, y - 15))
+        draw.text((x, y), character[1], ImageColor.getcolor(character[5], "RGB"), font=font)
+        glow = Image.new("RGBA", img.size, (0, 0, 0, 0))
+        ImageDraw.Draw(glow).text((x + 225, y), ilvl, ilvl_color, font=font)
+        blurred_glow = glow.filter(ImageFilter.GaussianBlur(GLOW_RADIUS))
+        ImageDraw.Draw(blurred_glow).text((x + 225, y), ilvl, ilvl_color, font=font)
+        img = Image.alpha_composite(img, blurred_glow)
+        draw = ImageDraw.Draw(img)
+        draw.text((x + 300, y), character[2], ImageColor.getcolor(character[3], "RGB"), font=font)
+        y += 75
+
+    img_obj = io.BytesIO()
+    img.save(img_obj, format="PNG")
+    return img_obj.getvalue()
@@ -1,13 +1,18 @@
+import asyncio
+import hashlib
+import heapq
 import io
+import json
 import logging
-from datetime import datetime, timezone
+import random
+import time
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import discord
-from aiohttp import ClientResponseError
+from aiohttp import ClientError, ClientResponseError
 from discord.ext import tasks
-from PIL import Image, ImageColor, ImageDraw, ImageFilter, ImageFont
 from redbot.core import commands
 from redbot.core.data_manager import bundled_data_path
 from redbot.core.i18n import Translator, set_contextual_locales_from_guild
@@ -16,9 +21,29 @@ from tabulate import tabulate
 
 from wowtools.exceptions import InvalidBlizzardAPI
 
+from .metrics import timed_loop
+from .renderer import render_history_graph, render_scoreboard
+from .scoreboard_diff import RankingDiff, diff_rankings
+
 log = logging.getLogger("red.karlo-cogs.wowtools")
 _ = Translator("WoWTools", __file__)
 
+PVP_BRACKETS = ("rbg", "2v2", "3v3")
+PVP_MAX_LEVEL = 80
+# A refresh's progress is written to the disk after this many members were checked
+PVP_SAVE_EVERY = 25
+# Older snapshots are still shown, but a refresh is started in the background
+PVP_SNAPSHOT_MAX_AGE = 3600
+# Unchanged scoreboard refreshes in a row before a guild's refreshes start backing off
+SB_BACKOFF_AFTER = 3
+SB_MAX_INTERVAL = 60 * 60
+# region: (weekday, UTC hour) of the weekly reset
+WEEKLY_RESETS = {"eu": (2, 7), "us": (1, 15)}
+# Scoreboards are refreshed on every tick for this long after a weekly reset
+RESET_WINDOW = timedelta(hours=12)
+# How often an unchanged scoreboard's message is checked for still existing, in seconds
+SB_MESSAGE_CHECK_INTERVAL = 60 * 60
+
 DEV_GUILDS = [362298824854863882, 133049272517001216]
 
 
@@ -56,28 +81,168 @@ class Scoreboard:
             else:
                 await ctx.send(embed=embed)
 
-    # @commands.cooldown(rate=1, per=60, type=commands.BucketType.guild)
-    # @wowscoreboard.command(name="pvp", hidden=True)
-    # @commands.guild_only()
-    # async def wowscoreboard_pvp(self, ctx: commands.Context):
-    #     """Get all the PvP related scoreboards for this guild.
-
-    #     **Characters that have not played all PvP gamemodes at
-    #     some point will not be shown.**
-    #     """
-    #     if ctx.interaction:
-    #         # There is no contextual locale for interactions, so we need to set it manually
-    #         # (This is probably a bug in Red, remove this when it's fixed)
-    #         await set_contextual_locales_from_guild(self.bot, ctx.guild)
-
-    #     try:
-    #         embed = await self._generate_pvp_scoreboard(ctx)
-    #     except InvalidBlizzardAPI:
-    #         await ctx.send(_("Blizzard API not properly set up."))
-    #         return
-    #     if embed:
-    #         # TODO: In dpy2, make this a list of embeds to send in a single message
-    #         await ctx.send(embed=embed)
+    @wowscoreboard.command(name="movers")
+    @commands.guild_only()
+    @commands.bot_has_permissions(embed_links=True)
+    async def wowscoreboard_movers(self, ctx: commands.Context):
+        """Show what changed in the last update of this server's scoreboard."""
+        if ctx.interaction:
+            # There is no contextual locale for interactions, so we need to set it manually
+            # (This is probably a bug in Red, remove this when it's fixed)
+            await set_contextual_locales_from_guild(self.bot, ctx.guild)
+
+        diff: Optional[RankingDiff] = self.scoreboard_diffs.get(ctx.guild.id)
+        if not diff:
+            await ctx.send(
+                _("No scoreboard changes have been recorded for this server yet."),
+                ephemeral=True,
+            )
+            return
+        await ctx.send(embed=await self._make_movers_embed(ctx, diff))
+
+    @wowscoreboard.command(name="history")
+    @commands.guild_only()
+    @commands.bot_has_permissions(embed_links=True, attach_files=True)
+    async def wowscoreboard_history(self, ctx: commands.Context, character: str):
+        """Show how a character's score on this server's scoreboard changed over time."""
+        if ctx.interaction:
+            # There is no contextual locale for interactions, so we need to set it manually
+            # (This is probably a bug in Red, remove this when it's fixed)
+            await set_contextual_locales_from_guild(self.bot, ctx.guild)
+
+        history = await self.scoreboard_history.get(ctx.guild.id, character)
+        if history is None:
+            await ctx.send(
+                _("{character} hasn't been on this server's scoreboard.").format(
+                    character=character
+                ),
+                ephemeral=True,
+            )
+            return
+
+        now = int(time.time())
+        png = await asyncio.get_running_loop().run_in_executor(
+            self.render_executor,
+            render_history_graph,
+            history.name.capitalize(),
+            history.timestamps.tolist(),
+            history.scores.tolist(),
+            str(bundled_data_path(self)),
+            now,
+        )
+        img_file = discord.File(fp=io.BytesIO(png), filename="history.png")
+
+        embed = discord.Embed(
+            title=_("Mythic+ score history of {character}").format(
+                character=history.name.capitalize()
+            ),
+            color=await ctx.embed_color(),
+        )
+        embed.add_field(name=_("Score"), value=humanize_number(history.scores[-1]))
+        embed.add_field(
+            name=_("Change"),
+            value=f"{history.scores[-1] - history.scores[0]:+}",
+        )
+        embed.add_field(name=_("First seen"), value=f"<t:{history.timestamps[0]}:R>")
+        if history.ilvls[-1]:
+            embed.add_field(name=_("Item level"), value=str(history.ilvls[-1]))
+        embed.set_image(url=f"attachment://{img_file.filename}")
+        await ctx.send(embed=embed, file=img_file)
+
+    async def _make_movers_embed(self, ctx: commands.Context, diff: RankingDiff) -> discord.Embed:
+        lines = []
+        for name, rank in diff.new_entrants.items():
+            lines.append(_("🆕 **{name}** entered at #{rank}").format(name=name, rank=rank))
+        for name, (old_rank, new_rank) in diff.moves.items():
+            arrow = "🔼" if new_rank < old_rank else "🔽"
+            lines.append(
+                _("{arrow} **{name}** #{old_rank} → #{new_rank}").format(
+                    arrow=arrow, name=name, old_rank=old_rank, new_rank=new_rank
+                )
+            )
+        for name, (old_score, new_score) in diff.score_deltas.items():
+            lines.append(
+                _("📈 **{name}** {old_score} → {new_score} ({delta:+})").format(
+                    name=name,
+                    old_score=humanize_number(old_score),
+                    new_score=humanize_number(new_score),
+                    delta=new_score - old_score,
+                )
+            )
+        for name, rank in diff.dropouts.items():
+            lines.append(_("❌ **{name}** dropped off (was #{rank})").format(name=name, rank=rank))
+
+        embed = discord.Embed(
+            title=_("Scoreboard movers"),
+            description="\n".join(lines)[:4096],
+            color=await ctx.embed_color(),
+            timestamp=diff.created,
+        )
+        embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon.url)
+        return embed
+
+    @wowscoreboard.command(name="pvp")
+    @commands.guild_only()
+    @commands.bot_has_permissions(embed_links=True)
+    async def wowscoreboard_pvp(self, ctx: commands.Context):
+        """Get all the PvP related scoreboards for this guild.
+
+        **Characters that have not played all PvP gamemodes at
+        some point will not be shown.**
+        """
+        if ctx.interaction:
+            # There is no contextual locale for interactions, so we need to set it manually
+            # (This is probably a bug in Red, remove this when it's fixed)
+            await set_contextual_locales_from_guild(self.bot, ctx.guild)
+
+        guild_config = await self.config.guild(ctx.guild).all()
+        if not await self._check_pvp_config(ctx, guild_config):
+            return
+        if not self.blizzard.get(guild_config["region"]):
+            await ctx.send(_("Blizzard API not properly set up."))
+            return
+
+        state = await self.pvp_store.load(ctx.guild.id)
+        snapshot = state["snapshot"]
+        if snapshot is not None and snapshot["guild"] != self._pvp_guild_key(guild_config):
+            # The server's guild was changed since the snapshot was made
+            snapshot = None
+        job = self.pvp_jobs.get(ctx.guild.id)
+        if (snapshot is None or time.time() - snapshot["finished"] > PVP_SNAPSHOT_MAX_AGE) and (
+            job is None or job.done()
+        ):
+            progress = state["progress"]
+            if progress is None or progress["guild"] != self._pvp_guild_key(guild_config):
+                # Fetched here instead of in the background job, so a wrong guild is reported
+                try:
+                    progress = await self._new_pvp_progress(guild_config)
+                except ClientResponseError:
+                    if snapshot is None:
+                        await ctx.send(_("Guild not found."))
+                        return
+                    log.warning(f"Could not refresh the PvP scoreboard of {ctx.guild.id}.")
+                    progress = None
+                else:
+                    state["progress"] = progress
+                    await self.pvp_store.save(ctx.guild.id)
+            if progress is not None:
+                self.start_pvp_refresh(ctx.guild.id, guild_config)
+
+        if snapshot is None:
+            progress = state["progress"] or {}
+            await ctx.send(
+                _(
+                    "The PvP scoreboard is being built in the background "
+                    "({checked}/{total} members checked), try again in a few minutes."
+                ).format(
+                    checked=progress.get("total", 0) - len(progress.get("pending", {})),
+                    total=progress.get("total", 0),
+                )
+            )
+            return
+
+        embed = await self._generate_pvp_scoreboard(ctx, snapshot, guild_config)
+        await ctx.send(embed=embed)
 
     @commands.hybrid_group()
     @commands.admin()
@@ -107,6 +272,7 @@ class Scoreboard:
                 )
             await self.config.guild(ctx.guild).scoreboard_channel.clear()
             await self.config.guild(ctx.guild).scoreboard_message.clear()
+            self.scoreboard_messages.pop(ctx.guild.id, None)
             await ctx.send(_("Scoreboard channel cleared."))
             return
         if (
@@ -140,6 +306,9 @@ class Scoreboard:
         else:
             sb_msg = await channel.send(embed=embed)
         await self.config.guild(ctx.guild).scoreboard_message.set(sb_msg.id)
+        await self.config.guild(ctx.guild).scoreboard_digest.clear()
+        self.scoreboard_messages[ctx.guild.id] = sb_msg
+        self.sb_scheduler.forget(ctx.guild.id)
         await ctx.send(_("Scoreboard channel set."))
 
     @sbset.group(name="blacklist", aliases=["blocklist"])
@@ -163,6 +332,7 @@ class Scoreboard:
             if character not in blacklist:
                 blacklist.append(character.lower())
         await self.config.guild(ctx.guild).scoreboard_blacklist.set(blacklist)
+        self.sb_scheduler.forget(ctx.guild.id)
         await ctx.send(_("Blacklisted characters added."))
 
     @sbset_blacklist.command(name="remove")
@@ -180,6 +350,7 @@ class Scoreboard:
             if character in blacklist:
                 blacklist.remove(character.lower())
         await self.config.guild(ctx.guild).scoreboard_blacklist.set(blacklist)
+        self.sb_scheduler.forget(ctx.guild.id)
         await ctx.send(_("Blacklisted characters removed."))
 
     @sbset_blacklist.command(name="list")
@@ -201,6 +372,7 @@ class Scoreboard:
     async def sbset_blacklist_clear(self, ctx: commands.Context):
         """Clear the scoreboard blacklist."""
         await self.config.guild(ctx.guild).scoreboard_blacklist.clear()
+        self.sb_scheduler.forget(ctx.guild.id)
         await ctx.send(_("Blacklisted characters cleared."))
 
     @sbset.command(name="lock", hidden=True)
@@ -305,48 +477,118 @@ class Scoreboard:
 
         await self.config.guild(ctx.guild).scoreboard_channel.clear()
         await self.config.guild(ctx.guild).scoreboard_message.clear()
+        self.scoreboard_messages.pop(ctx.guild.id, None)
         await ctx.send(_("Scoreboard locked."))
 
     @tasks.loop(minutes=5)
+    @timed_loop("update_dungeon_scoreboard")
     async def update_dungeon_scoreboard(self):
-        for guild in self.bot.guilds:
-            if await self.bot.cog_disabled_in_guild(self, guild):
-                continue
-            await set_contextual_locales_from_guild(self.bot, guild)
-
-            sb_channel_id: int = await self.config.guild(guild).scoreboard_channel()
-            sb_msg_id: int = await self.config.guild(guild).scoreboard_message()
-            if not (sb_channel_id and sb_msg_id):
-                continue
-            sb_channel: discord.TextChannel = guild.get_channel(sb_channel_id)
+        # One snapshot of the config per tick instead of several reads per guild
+        with self.metrics.timer("scoreboard", "config"):
+            global_config: dict = await self.config.all()
+            all_guilds: dict[int, dict] = await self.config.all_guilds()
+        guild_timeout: int = global_config["sb_guild_timeout"]
+        start_jitter: int = global_config["sb_start_jitter"]
+        semaphore = asyncio.Semaphore(max(global_config["sb_concurrency"], 1))
+
+        async def run(guild: discord.Guild) -> Optional[bool]:
+            # Spread the start of each guild's update so they don't all hit the APIs at once
+            await asyncio.sleep(random.uniform(0, start_jitter))
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self._update_guild_scoreboard(guild, all_guilds[guild.id], global_config),
+                    timeout=guild_timeout,
+                )
 
-            try:
-                sb_msg: discord.Message = await sb_channel.fetch_message(sb_msg_id)
-            except discord.HTTPException:
+        tick_start = time.monotonic()
+        configured = [
+            guild
+            for guild_id, guild_config in all_guilds.items()
+            if guild_config["scoreboard_channel"]
+            and guild_config["scoreboard_message"]
+            and (guild := self.bot.get_guild(guild_id))
+        ]
+        # Quiet guilds are refreshed less often, see RefreshScheduler
+        guilds = [
+            guild
+            for guild in configured
+            if self.sb_scheduler.is_due(guild.id, all_guilds[guild.id]["region"], tick_start)
+        ]
+        results = await asyncio.gather(*(run(guild) for guild in guilds), return_exceptions=True)
+        duration = time.monotonic() - tick_start
+
+        failures: dict[int, str] = {}
+        for guild, result in zip(guilds, results):
+            self.sb_scheduler.record(
+                guild.id, None if isinstance(result, BaseException) else result, tick_start
+            )
+            if isinstance(result, asyncio.TimeoutError):
+                failures[guild.id] = f"Timed out after {guild_timeout} seconds"
+                log.warning(
+                    f"Scoreboard update in guild {guild.id} ({guild.name}) timed out "
+                    f"after {guild_timeout} seconds."
+                )
+            elif isinstance(result, Exception):
+                failures[guild.id] = f"{type(result).__name__}: {result}"
                 log.error(
-                    f"Failed to fetch scoreboard message in guild {guild.id} ({guild.name}).",
-                    exc_info=True,
+                    f"Failed to update scoreboard in guild {guild.id} ({guild.name}).",
+                    exc_info=result,
                 )
-                continue
-            if not sb_msg:
-                continue
 
-            max_chars = 20
-            headers = ["#", _("Name"), _("Score")]
-            region: str = await self.config.guild(guild).region()
-            realm: str = await self.config.guild(guild).realm()
-            guild_name: str = await self.config.guild(guild).real_guild_name()
-            sb_blacklist: List[str] = await self.config.guild(guild).scoreboard_blacklist()
-            if not region or not realm or not guild_name:
-                continue
-            image: bool = await self.config.guild(guild).sb_image()
-
-            embed = discord.Embed(
-                title=_("Mythic+ Guild Scoreboard"),
-                color=await self.bot.get_embed_color(sb_msg),
+        self.sb_tick_stats = {
+            "finished": datetime.now(timezone.utc),
+            "duration": duration,
+            "guilds": len(guilds),
+            "deferred": len(configured) - len(guilds),
+            "failures": failures,
+        }
+        log.debug(
+            f"Scoreboard tick finished in {duration:.2f}s for {len(guilds)} guilds "
+            f"with {len(failures)} failures."
+        )
+        if duration > self.update_dungeon_scoreboard.minutes * 60:
+            log.warning(
+                f"Scoreboard tick took {duration:.2f}s, which is longer than the update interval."
             )
-            embed.set_author(name=guild.name, icon_url=guild.icon.url)
-            try:
+
+    async def _update_guild_scoreboard(
+        self, guild: discord.Guild, guild_config: dict, global_config: dict
+    ) -> Optional[bool]:
+        """
+        Update a guild's scoreboard message.
+
+        :return: True if the scoreboard changed, False if it didn't, and None if it couldn't be
+            checked at all.
+        """
+        if await self.bot.cog_disabled_in_guild(self, guild):
+            return
+        await set_contextual_locales_from_guild(self.bot, guild)
+
+        sb_channel_id: int = guild_config["scoreboard_channel"]
+        sb_msg_id: int = guild_config["scoreboard_message"]
+        if not (sb_channel_id and sb_msg_id):
+            return
+        sb_channel: discord.TextChannel = guild.get_channel(sb_channel_id)
+        if not sb_channel:
+            return
+
+        max_chars = 20
+        headers = ["#", _("Name"), _("Score")]
+        region: str = guild_config["region"]
+        realm: str = guild_config["realm"]
+        guild_name: str = guild_config["real_guild_name"]
+        sb_blacklist: List[str] = guild_config["scoreboard_blacklist"]
+        if not region or not realm or not guild_name:
+            return
+        image: bool = guild_config["sb_image"]
+
+        embed = discord.Embed(
+            title=_("Mythic+ Guild Scoreboard"),
+            color=await self.bot.get_embed_color(sb_channel),
+        )
+        embed.set_author(name=guild.name, icon_url=guild.icon.url)
+        try:
+            with self.metrics.timer("scoreboard", "fetch", guild.id):
                 tabulate_list = await self._get_dungeon_scores(
                     guild_name,
                     max_chars,
@@ -355,64 +597,135 @@ class Scoreboard:
                     sb_blacklist,
                     image=image,
                 )
-            except ValueError as e:
-                log.error(f"Error getting dungeon scores for {guild.id}, skipping. Response: {e}")
-                continue
+                cutoff = await self.get_season_title_cutoff(region)
+        except ValueError as e:
+            log.error(f"Error getting dungeon scores for {guild.id}, skipping. Response: {e}")
+            return
 
-            # TODO: When dpy2 is out, use discord.utils.format_dt()
-            desc = _("Last updated <t:{timestamp}:R>\n").format(
-                timestamp=int(datetime.now(timezone.utc).timestamp())
-            )
-            if cutoff := await self.get_season_title_cutoff(region):
-                desc += _("Score cutoff for season title: `{cutoff}`\n").format(cutoff=cutoff)
+        # Don't render, upload or edit anything if the rankings haven't changed
+        digest = self._scoreboard_digest(tabulate_list, image, cutoff)
+        if digest == guild_config["scoreboard_digest"]:
+            # Nothing gets edited, so a deleted message would otherwise go unnoticed
+            checked = self.scoreboard_checked.get(guild.id)
+            if checked is not None and time.monotonic() - checked < SB_MESSAGE_CHECK_INTERVAL:
+                return False
+            try:
+                await sb_channel.fetch_message(sb_msg_id)
+            except discord.NotFound:
+                log.error(f"Scoreboard message in guild {guild.id} ({guild.name}) not found.")
+                await self.config.guild(guild).scoreboard_digest.clear()
+                self.scoreboard_messages.pop(guild.id, None)
+                return
+            except discord.HTTPException:
+                return False
+            self.scoreboard_checked[guild.id] = time.monotonic()
+            return False
+        await self.scoreboard_history.append(guild.id, tabulate_list)
 
-            if image:
+        diff = None
+        previous_image, previous_rows = self.scoreboard_rows.get(guild.id, (None, None))
+        if previous_rows is not None and previous_image == image:
+            diff = diff_rankings(previous_rows, tabulate_list)
+
+        # TODO: When dpy2 is out, use discord.utils.format_dt()
+        desc = _("Last updated <t:{timestamp}:R>\n").format(
+            timestamp=int(datetime.now(timezone.utc).timestamp())
+        )
+        if cutoff:
+            desc += _("Score cutoff for season title: `{cutoff}`\n").format(cutoff=cutoff)
+
+        if image:
+            with self.metrics.timer("scoreboard", "render", guild.id):
                 img_file = await self._generate_scoreboard_image(
-                    tabulate_list, dev_guild=guild.id in DEV_GUILDS
-                )
-                embed.set_image(url=f"attachment://{img_file.filename}")
-                embed.set_footer(text=_("Updates every 5 minutes"))
-            else:
-                formatted_rankings = box(
-                    tabulate(
-                        tabulate_list,
-                        headers=headers,
-                        tablefmt="plain",
-                        disable_numparse=True,
-                    ),
-                    lang="md",
+                    tabulate_list,
+                    dev_guild=guild.id in DEV_GUILDS,
+                    guild_id=guild.id,
+                    changed_rows=diff.changed_rows if diff is not None else None,
                 )
-                desc += formatted_rankings
-
-                # Don't edit if there wouldn't be a change
-                old_rankings = sb_msg.embeds[0].description.splitlines()
-                old_rankings = "\n".join(old_rankings[1:])
-                if old_rankings == formatted_rankings:
-                    continue
-                embed.set_footer(text=_("Updates only when there is a ranking change"))
+            embed.set_image(url=f"attachment://{img_file.filename}")
+        else:
+            formatted_rankings = box(
+                tabulate(
+                    tabulate_list,
+                    headers=headers,
+                    tablefmt="plain",
+                    disable_numparse=True,
+                ),
+                lang="md",
+            )
+            desc += formatted_rankings
+        embed.set_footer(text=_("Updates only when there is a ranking change"))
+        self.scoreboard_rows[guild.id] = (image, tabulate_list)
+        if diff:
+            self.scoreboard_diffs[guild.id] = diff
 
-            ass_integration = await self.config.assistant_cog_integration()
-            if (assistant := self.bot.get_cog("Assistant")) and ass_integration:
-                await self.add_assistant_embedding(assistant, guild, image, tabulate_list)
+        ass_integration: bool = global_config["assistant_cog_integration"]
+        if (assistant := self.bot.get_cog("Assistant")) and ass_integration:
+            await self.add_assistant_embedding(assistant, guild, image, tabulate_list)
 
-            embed.description = desc
+        embed.description = desc
 
-            try:
-                if image:
-                    await sb_msg.edit(embed=embed, attachments=[img_file])
-                else:
-                    await sb_msg.edit(embed=embed, attachments=[])
-            except discord.Forbidden:
-                log.error(
-                    f"Failed to edit scoreboard message in guild {guild.id} ({guild.name}) "
-                    f"due to missing permissions.",
-                    exc_info=True,
-                )
-            except discord.HTTPException:
-                log.error(
-                    f"Failed to edit scoreboard message in guild {guild.id} ({guild.name}).",
-                    exc_info=True,
+        try:
+            with self.metrics.timer("scoreboard", "edit", guild.id):
+                await self._edit_scoreboard_message(
+                    sb_channel,
+                    sb_msg_id,
+                    embed=embed,
+                    attachments=[img_file] if image else [],
                 )
+        except discord.NotFound:
+            log.error(
+                f"Scoreboard message in guild {guild.id} ({guild.name}) not found.",
+                exc_info=True,
+            )
+            return
+        except discord.Forbidden:
+            log.error(
+                f"Failed to edit scoreboard message in guild {guild.id} ({guild.name}) "
+                f"due to missing permissions.",
+                exc_info=True,
+            )
+            return
+        except discord.HTTPException:
+            log.error(
+                f"Failed to edit scoreboard message in guild {guild.id} ({guild.name}).",
+                exc_info=True,
+            )
+            return
+        await self.config.guild(guild).scoreboard_digest.set(digest)
+        self.scoreboard_checked[guild.id] = time.monotonic()
+        return True
+
+    async def _edit_scoreboard_message(
+        self, sb_channel: discord.TextChannel, sb_msg_id: int, **fields
+    ) -> discord.Message:
+        """
+        Edit a scoreboard message without fetching it first.
+
+        Message handles are cached per guild, the message is only fetched if editing
+        the cached handle fails because it wasn't found.
+        """
+        guild_id = sb_channel.guild.id
+        sb_msg = self.scoreboard_messages.get(guild_id)
+        if sb_msg is None or sb_msg.id != sb_msg_id or sb_msg.channel.id != sb_channel.id:
+            sb_msg = sb_channel.get_partial_message(sb_msg_id)
+        try:
+            edited = await sb_msg.edit(**fields)
+        except discord.NotFound:
+            self.scoreboard_messages.pop(guild_id, None)
+            sb_msg = await sb_channel.fetch_message(sb_msg_id)
+            for attachment in fields.get("attachments", []):
+                if isinstance(attachment, discord.File):
+                    attachment.reset()
+            edited = await sb_msg.edit(**fields)
+        self.scoreboard_messages[guild_id] = edited
+        return edited
+
+    @staticmethod
+    def _scoreboard_digest(tabulate_list: list, image: bool, cutoff: float) -> str:
+        """Hash everything that ends up on the scoreboard, apart from the timestamp."""
+        data = json.dumps([image, cutoff, tabulate_list], separators=(",", ":"))
+        return hashlib.sha256(data.encode()).hexdigest()
 
     @staticmethod
     async def add_assistant_embedding(assistant, guild, image, tabulate_list):
@@ -434,17 +747,62 @@ class Scoreboard:
             log.error(f"Error adding scoreboard to Assistant: {e}", exc_info=True)
 
     async def get_season_title_cutoff(self, region: str) -> float:
-        current_season = "season-mn-1"  # TODO: Needs to be manually updated every season
-        cutoffs = (
-            await self.raiderio_api.get_mythic_plus_season_cutoffs(region, current_season)
-        ).get("cutoffs")
+        """Get the season title cutoff of a region, cached and refreshed in the background."""
+        season: str = self.mplus_season
+
+        async def fetch_cutoff() -> float:
+            return await self._fetch_season_title_cutoff(region, season)
+
+        return await self.cutoff_cache.get_or_fetch((region.lower(), season), fetch_cutoff)
+
+    async def _fetch_season_title_cutoff(self, region: str, season: str) -> float:
+        self.metrics.count_request("raider.io")
+        cutoffs = (await self.raiderio_api.get_mythic_plus_season_cutoffs(region, season)).get(
+            "cutoffs"
+        )
         return cutoffs["p999"]["all"]["quantileMinValue"] if cutoffs else 0
 
+    @tasks.loop(hours=1)
+    @timed_loop("refresh_season_cutoffs")
+    async def refresh_season_cutoffs(self):
+        # A single request per region in use, no matter how many guilds are in that region
+        all_guilds: dict[int, dict] = await self.config.all_guilds()
+        regions = {
+            guild_config["region"].lower()
+            for guild_config in all_guilds.values()
+            if guild_config["region"] and guild_config["scoreboard_channel"]
+        }
+        season: str = self.mplus_season
+        for region in regions:
+            try:
+                cutoff = await self._fetch_season_title_cutoff(region, season)
+            except Exception:
+                log.warning(f"Failed to refresh season cutoff for {region}.", exc_info=True)
+                continue
+            self.cutoff_cache.set((region, season), cutoff)
+
     @update_dungeon_scoreboard.error
     async def update_dungeon_scoreboard_error(self, error):
         # Thanks Flame!
         log.error(f"Unhandled error in update_dungeon_scoreboard task: {error}", exc_info=True)
 
+    @refresh_season_cutoffs.error
+    async def refresh_season_cutoffs_error(self, error):
+        log.error(f"Unhandled error in refresh_season_cutoffs task: {error}", exc_info=True)
+
+    async def get_raiderio_guild_roster(self, region: str, realm: str, guild_name: str) -> dict:
+        """Get a guild's Raider.io roster, shared between every server using the same guild."""
+
+        async def fetch_roster() -> dict:
+            self.metrics.count_request("raider.io")
+            roster = await self.raiderio_api.get_guild_roster(region, realm, guild_name)
+            if "error" in roster.keys():
+                raise ValueError(f"{roster['message']}.")
+            return roster
+
+        key = (region.lower(), realm.lower(), guild_name.lower())
+        return await self.roster_cache.get_or_fetch(key, fetch_roster)
+
     async def _get_dungeon_scores(
         self,
         guild_name: str,
@@ -454,62 +812,50 @@ class Scoreboard:
         sb_blacklist: List[str],
         image: bool,
     ):
-        roster = await self.raiderio_api.get_guild_roster(region, realm, guild_name)
-        if "error" in roster.keys():
-            raise ValueError(f"{roster['message']}.")
-
-        lb = {}
-        # TODO: Surely there's a better way to do literally everything below
-        for char in roster["guildRoster"]["roster"]:
-            char_name: str = char["character"]["name"]
-            if any(char.isdigit() for char in char_name):
+        roster = await self.get_raiderio_guild_roster(region, realm, guild_name)
+
+        blacklist = {name.lower() for name in sb_blacklist}
+        # Filter in a single pass, rankings are keyed by name so only the best character of
+        # each name is kept
+        members: Dict[str, dict] = {}
+        for member in roster["guildRoster"]["roster"]:
+            char_name: str = member["character"]["name"]
+            score = member["keystoneScores"]["allScore"]
+            if (
+                score <= 250
+                or any(char.isdigit() for char in char_name)
+                or char_name.lower() in blacklist
+            ):
                 continue
-
-            score = char["keystoneScores"]["allScore"]
-
-            if score > 250 and char_name.lower() not in sb_blacklist:
-                if image:
-                    class_color: str = ClassColor.get_class_color(
-                        char["character"]["class"]["name"]
-                    )
-                    char_img: str = (
-                        "https://render.worldofwarcraft.com/{region}/character/{}".format(
-                            char["character"]["thumbnail"], region=region
-                        )
-                    )
-                    ilvl = str(char["character"]["items"]["item_level_equipped"])
-                    score_color: str = char["keystoneScores"]["allScoreColor"]
-                    lb[char_name] = (score, score_color, char_img, class_color, ilvl)
-                else:
-                    lb[char_name] = score
-
-        lb = dict(sorted(lb.items(), key=lambda i: i[1], reverse=True))
-
-        chars = list(lb.keys())[:max_chars]
-        scores = list(lb.values())[:max_chars]
+            best = members.get(char_name)
+            if best is None or score > best["keystoneScores"]["allScore"]:
+                members[char_name] = member
+        # Only keep the rows that will be shown
+        top_members = heapq.nlargest(
+            max_chars, members.values(), key=lambda member: member["keystoneScores"]["allScore"]
+        )
 
         tabulate_list = []
-        for index, char_info in enumerate(zip(chars, scores)):
-            char_name = char_info[0]
+        for index, member in enumerate(top_members):
+            char_name: str = member["character"]["name"]
+            char_score = member["keystoneScores"]["allScore"]
             if image:
-                char_score = char_info[1][0]
-                char_score_color = char_info[1][1]
-                char_img = char_info[1][2]
-                class_color = char_info[1][3]
-                ilvl = char_info[1][4]
+                class_color: str = ClassColor.get_class_color(member["character"]["class"]["name"])
+                char_img: str = "https://render.worldofwarcraft.com/{region}/character/{}".format(
+                    member["character"]["thumbnail"], region=region
+                )
                 tabulate_list.append(
                     [
                         f"{index + 1}.",
                         char_name,
                         str(int(char_score)),
-                        char_score_color,
+                        member["keystoneScores"]["allScoreColor"],
                         char_img,
                         class_color,
-                        ilvl,
+                        str(member["character"]["items"]["item_level_equipped"]),
                     ]
                 )
             else:
-                char_score = char_info[1]
                 tabulate_list.append(
                     [
                         f"{index + 1}.",
@@ -571,70 +917,57 @@ class Scoreboard:
             )
             return embed
 
-    async def _generate_scoreboard_image(self, tabulate_list: list, dev_guild: bool = False):
-        img_path = str(
-            bundled_data_path(self) / "scoreboard-jrk.png"
-            if dev_guild
-            else bundled_data_path(self) / "scoreboard-df-s1.png"
-        )
-        img = Image.open(img_path)
-        draw = ImageDraw.Draw(img)
-        font = ImageFont.truetype(str(bundled_data_path(self) / "Roboto-Bold.ttf"), 28)
-
-        x = 150
-        y = 100 if dev_guild else 25
-
-        for character in tabulate_list[:10]:
-            char_name = character[1]
-            score = character[2]
-            ilvl = character[6]
-
-            score_color = ImageColor.getcolor(character[3], "RGB")
-            class_color = ImageColor.getcolor(character[5], "RGB")
-            ilvl_color = self._get_ilvl_color(int(ilvl))
-
-            async with self.session.request("GET", character[4]) as resp:
-                image = await resp.content.read()
-                image = Image.open(io.BytesIO(image))
-                image = image.resize((65, 65))
-                img.paste(image, (x - 79, y - 15))
-
-            draw.text((x, y), char_name, class_color, font=font)
-            if int(ilvl) >= 679:  # This is whatever the color for the highest ilvl is
-                glow = Image.new("RGBA", img.size, (0, 0, 0, 0))
-                ImageDraw.Draw(glow).text((x + 225, y), ilvl, ilvl_color, font=font)
-                blurred_glow = glow.filter(ImageFilter.GaussianBlur(5))
-                ImageDraw.Draw(blurred_glow).text((x + 225, y), ilvl, ilvl_color, font=font)
-                img = Image.alpha_composite(img, blurred_glow)
-                # have to reassing draw
-                draw = ImageDraw.Draw(img)
-            else:
-                draw.text((x + 225, y), ilvl, ilvl_color, font=font)
-            draw.text((x + 300, y), score, score_color, font=font)
-            y += 75
-
-        img_obj = io.BytesIO()
-        img.save(img_obj, format="PNG")
-        img_obj.seek(0)
-
-        return discord.File(fp=img_obj, filename="scoreboard.png")
+    async def _generate_scoreboard_image(
+        self,
+        tabulate_list: list,
+        dev_guild: bool = False,
+        guild_id: Optional[int] = None,
+        changed_rows: Optional[List[int]] = None,
+    ):
+        """
+        Render the scoreboard image.
 
-    @staticmethod
-    def _get_ilvl_color(ilvl: int) -> str:
-        if ilvl >= 717:
-            return "#f16960"
-        elif ilvl >= 714:
-            return "#FF69B4"
-        elif ilvl >= 709:
-            return "#FFA500"
-        elif ilvl >= 705:
-            return "#b040c2"
-        elif ilvl >= 698:
-            return "#445bc2"
-        elif ilvl >= 692:
-            return "#00ff1a"
-        else:
-            return "#FFFFFF"
+        If ``guild_id`` is given, the render is saved so the next one can start from it.
+        With ``changed_rows`` as well, only those rows are redrawn on top of the saved render.
+        """
+        base_path = None
+        if guild_id is not None:
+            image_path = self.scoreboard_image_path / f"{guild_id}.png"
+            if changed_rows is not None and image_path.exists():
+                base_path = str(image_path)
+
+        if base_path and not changed_rows:
+            # Nothing on the image itself changed, reuse the previous render as is
+            png = await asyncio.to_thread(image_path.read_bytes)
+            return discord.File(fp=io.BytesIO(png), filename="scoreboard.png")
+
+        # Fetch every thumbnail that will be drawn up front, concurrently and from the cache
+        rows_to_draw = [
+            index
+            for index in (changed_rows if base_path else range(10))
+            if index < min(len(tabulate_list), 10)
+        ]
+        fetched = await self.avatar_cache.get_many(
+            [tabulate_list[index][4] for index in rows_to_draw]
+        )
+        avatars: list[bytes | None] = [None] * min(len(tabulate_list), 10)
+        for index, avatar in zip(rows_to_draw, fetched):
+            avatars[index] = avatar
+
+        # Rendering is CPU heavy, keep it away from the event loop
+        png = await asyncio.get_running_loop().run_in_executor(
+            self.render_executor,
+            render_scoreboard,
+            tabulate_list,
+            avatars,
+            str(bundled_data_path(self)),
+            dev_guild,
+            base_path,
+            changed_rows if base_path else None,
+        )
+        if guild_id is not None:
+            await asyncio.to_thread(image_path.write_bytes, png)
+        return discord.File(fp=io.BytesIO(png), filename="scoreboard.png")
 
     @staticmethod
     async def _delete_scoreboard(ctx: commands.Context, sb_channel_id: int, sb_msg_id: int):
@@ -647,178 +980,241 @@ class Scoreboard:
         if sb_msg:
             await sb_msg.delete()
 
-    async def _generate_pvp_scoreboard(self, ctx: commands.Context) -> Optional[discord.Embed]:
-        max_chars = 10
-        headers = ["#", _("Name"), _("Rating")]
-        guild_name, realm, region, sb_blacklist = await self._get_guild_config(ctx)
-        if not region:
+    async def _check_pvp_config(self, ctx: commands.Context, guild_config: dict) -> bool:
+        if not guild_config["region"]:
             await ctx.send(
                 _(
                     "\nA server admin needs to set a region with `{prefix}wowset region` first."
                 ).format(prefix="" if ctx.interaction else ctx.clean_prefix)
             )
-            return None
-        if not realm:
+            return False
+        if not guild_config["realm"]:
             await ctx.send(
                 _(
                     "\nA server admin needs to set a realm with `{prefix}wowset realm` first."
                 ).format(prefix="" if ctx.interaction else ctx.clean_prefix)
             )
-            return None
-        if not guild_name:
+            return False
+        if not guild_config["real_guild_name"]:
             await ctx.send(
                 _(
                     "\nA server admin needs to set a guild name with `{prefix}wowset guild` first."
                 ).format(prefix="" if ctx.interaction else ctx.clean_prefix)
             )
-            return None
+            return False
+        return True
 
-        msg = await ctx.send(
-            _("Fetching scoreboard...\nThis can take up to 30 minutes for very large guilds.")
-        )
+    async def _generate_pvp_scoreboard(
+        self, ctx: commands.Context, snapshot: dict, guild_config: dict
+    ) -> discord.Embed:
+        max_chars = 10
+        headers = ["#", _("Name"), _("Rating")]
+        sb_blacklist = set(guild_config["scoreboard_blacklist"])
+
+        roster = {}
+        for bracket in PVP_BRACKETS:
+            # The blacklist can change after the snapshot was taken, so it's applied here too
+            ratings = (
+                (name, rating)
+                for name, rating in snapshot["ratings"][bracket].items()
+                if name not in sb_blacklist
+            )
+            roster[bracket] = dict(heapq.nlargest(max_chars, ratings, key=lambda i: i[1]))
+        tabulate_lists = await self._make_tabulate_lists(max_chars, roster)
 
         embed_pvp = discord.Embed(
             title=_("Guild PvP Leaderboard"),
-            color=await ctx.embed_color(),
-        )
-
-        tabulate_lists = await self._get_pvp_scores(
-            ctx, guild_name, max_chars, realm, region, sb_blacklist
-        )
-        if not tabulate_lists:
-            await msg.delete()
-            return None
-
-        embed_pvp.add_field(
-            name=_("RBG Leaderboard"),
-            value=box(
-                tabulate(
-                    tabulate_lists[0],
-                    headers=headers,
-                    tablefmt="plain",
-                    disable_numparse=True,
-                ),
-                lang="md",
-            ),
-            inline=False,
-        )
-        embed_pvp.add_field(
-            name=_("2v2 Arena Leaderboard"),
-            value=box(
-                tabulate(
-                    tabulate_lists[1],
-                    headers=headers,
-                    tablefmt="plain",
-                    disable_numparse=True,
-                ),
-                lang="md",
+            description=_("Last updated <t:{timestamp}:R>").format(
+                timestamp=int(snapshot["finished"])
             ),
-            inline=False,
+            color=await ctx.embed_color(),
         )
-        embed_pvp.add_field(
-            name=_("3v3 Arena Leaderboard"),
-            value=box(
-                tabulate(
-                    tabulate_lists[2],
-                    headers=headers,
-                    tablefmt="plain",
-                    disable_numparse=True,
+        for name, tabulate_list in zip(
+            (_("RBG Leaderboard"), _("2v2 Arena Leaderboard"), _("3v3 Arena Leaderboard")),
+            tabulate_lists,
+        ):
+            embed_pvp.add_field(
+                name=name,
+                value=box(
+                    tabulate(
+                        tabulate_list,
+                        headers=headers,
+                        tablefmt="plain",
+                        disable_numparse=True,
+                    ),
+                    lang="md",
                 ),
-                lang="md",
-            ),
-            inline=False,
-        )
-
-        await msg.delete()
+                inline=False,
+            )
+        job = self.pvp_jobs.get(ctx.guild.id)
+        if job is not None and not job.done():
+            embed_pvp.set_footer(text=_("A refresh is running in the background"))
         return embed_pvp
 
-    async def _get_pvp_scores(
-        self,
-        ctx,
-        guild_name: str,
-        max_chars: int,
-        realm: str,
-        region: str,
-        sb_blacklist: List[str],
-    ) -> list:
+    @staticmethod
+    def _pvp_guild_key(guild_config: dict) -> list:
+        return [
+            guild_config["region"],
+            guild_config["realm"],
+            guild_config["real_guild_name"].replace(" ", "-").lower(),
+        ]
+
+    def start_pvp_refresh(
+        self, guild_id: int, guild_config: Optional[dict] = None
+    ) -> asyncio.Task:
+        """
+        Start rebuilding a guild's PvP scoreboard in the background, unless it's already running.
+
+        :param guild_id: The Discord guild to refresh.
+        :param guild_config: The guild's config. Without it, only an interrupted refresh
+            can be resumed.
+        """
+        job = self.pvp_jobs.get(guild_id)
+        if job is None or job.done():
+            job = asyncio.create_task(self._run_pvp_refresh(guild_id, guild_config))
+            self.pvp_jobs[guild_id] = job
+        return job
+
+    async def _run_pvp_refresh(self, guild_id: int, guild_config: Optional[dict]) -> None:
+        state = await self.pvp_store.load(guild_id)
+        progress = state["progress"]
+        if progress is not None and guild_config is not None:
+            if progress["guild"] != self._pvp_guild_key(guild_config):
+                progress = None
         try:
-            api_client = self.blizzard.get(region)
-        except Exception as e:
-            await ctx.send(_("Command failed successfully. {e}").format(e=e))
-            return []
+            if progress is None:
+                if guild_config is None:
+                    return
+                progress = await self._new_pvp_progress(guild_config)
+                state["progress"] = progress
+                await self.pvp_store.save(guild_id)
+            else:
+                log.info(
+                    f"Resuming PvP scoreboard refresh for {guild_id}, "
+                    f"{len(progress['pending'])} of {progress['total']} members left."
+                )
+            await self._check_pvp_members(guild_id, progress)
+        except asyncio.CancelledError:
+            # Cog unload, keep whatever was checked so far for the next load
+            self.pvp_store.save_now(guild_id)
+            raise
+        except Exception:
+            log.error(f"PvP scoreboard refresh for {guild_id} failed.", exc_info=True)
+            if state["progress"] is not None:
+                await self.pvp_store.save(guild_id)
+            return
+
+        state["snapshot"] = {
+            "guild": progress["guild"],
+            "season": progress["season"],
+            "finished": time.time(),
+            "ratings": progress["ratings"],
+        }
+        state["progress"] = None
+        await self.pvp_store.save(guild_id)
+        log.debug(f"PvP scoreboard refresh for {guild_id} finished.")
+
+    async def _new_pvp_progress(self, guild_config: dict) -> dict:
+        guild_key = self._pvp_guild_key(guild_config)
+        region, realm, guild_name = guild_key
+        api_client = self.blizzard.get(region)
         if not api_client:
             raise InvalidBlizzardAPI
-        guild_name = guild_name.replace(" ", "-").lower()
+        sb_blacklist = set(guild_config["scoreboard_blacklist"])
 
-        max_level = 80
         async with api_client as client:
             wow_client = client.Retail
-            # await self.limiter.acquire()
+            await self.limiter.acquire()
+            self.metrics.count_request("blizzard", 2)
             current_season: int = (await wow_client.GameData.get_pvp_seasons_index())[
                 "current_season"
             ]["id"]
+            await self.limiter.acquire()
+            guild_roster = await wow_client.Profile.get_guild_roster(
+                name_slug=guild_name, realm_slug=realm
+            )
 
-            # await self.limiter.acquire()
-            try:
-                guild_roster = await wow_client.Profile.get_guild_roster(
-                    name_slug=guild_name, realm_slug=realm
+        # character name: realm slug
+        pending = {}
+        for member in guild_roster["members"]:
+            character_name = member["character"]["name"].lower()
+            if character_name in sb_blacklist:
+                continue
+            if member["character"]["level"] < PVP_MAX_LEVEL:
+                continue
+            pending[character_name] = member["character"].get("realm", {}).get("slug", realm)
+
+        return {
+            "guild": guild_key,
+            "season": current_season,
+            "started": time.time(),
+            "total": len(pending),
+            "pending": pending,
+            "ratings": {bracket: {} for bracket in PVP_BRACKETS},
+        }
+
+    async def _check_pvp_members(self, guild_id: int, progress: dict) -> None:
+        api_client = self.blizzard.get(progress["guild"][0])
+        if not api_client:
+            raise InvalidBlizzardAPI
+        concurrency: int = await self.config.pvp_concurrency()
+        members = iter(list(progress["pending"].items()))
+        checked = 0
+
+        async def worker():
+            nonlocal checked
+            # Every worker pulls the next member from the same iterator until it runs out
+            for character_name, realm in members:
+                ratings = await self._get_character_pvp_ratings(
+                    client, character_name, realm, progress["season"]
                 )
-            except ClientResponseError:
-                await ctx.send(_("Guild not found."))
-                return []
-
-            roster = {"rbg": {}, "2v2": {}, "3v3": {}}
+                for bracket, rating in ratings.items():
+                    progress["ratings"][bracket][character_name] = rating
+                del progress["pending"][character_name]
+                checked += 1
+                if checked % PVP_SAVE_EVERY == 0:
+                    await self.pvp_store.save(guild_id)
 
-            for member in guild_roster["members"]:
-                character_name = member["character"]["name"].lower()
-                if character_name in sb_blacklist:
-                    continue
-                if member["character"]["level"] < max_level:
-                    continue
-
-                log.debug(f"Getting PvP data for {character_name}")
-                try:
-                    (
-                        rbg_statistics,
-                        duo_statistics,
-                        tri_statistics,
-                    ) = await client.multi_request(
-                        [
-                            wow_client.Profile.get_character_pvp_bracket_statistics(
-                                character_name=character_name,
-                                realm_slug=realm,
-                                pvp_bracket="rbg",
-                            ),
-                            wow_client.Profile.get_character_pvp_bracket_statistics(
-                                character_name=character_name,
-                                realm_slug=realm,
-                                pvp_bracket="2v2",
-                            ),
-                            wow_client.Profile.get_character_pvp_bracket_statistics(
-                                character_name=character_name,
-                                realm_slug=realm,
-                                pvp_bracket="3v3",
-                            ),
-                        ]
+        async with api_client as client:
+            workers = [asyncio.create_task(worker()) for __ in range(concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                # If one worker fails, don't leave the others running on their own
+                for task in workers:
+                    task.cancel()
+
+    async def _get_character_pvp_ratings(
+        self, client, character_name: str, realm: str, season: int
+    ) -> dict:
+        log.debug(f"Getting PvP data for {character_name}")
+        wow_client = client.Retail
+        await self.limiter.acquire(len(PVP_BRACKETS))
+        self.metrics.count_request("blizzard", len(PVP_BRACKETS))
+        try:
+            statistics = await client.multi_request(
+                [
+                    wow_client.Profile.get_character_pvp_bracket_statistics(
+                        character_name=character_name,
+                        realm_slug=realm,
+                        pvp_bracket=bracket,
                     )
-                except ClientResponseError:
-                    continue
-
-                if "rating" in rbg_statistics and rbg_statistics["season"]["id"] == current_season:
-                    roster["rbg"][character_name] = rbg_statistics["rating"]
-                    log.debug(f"{character_name} has RBG rating {rbg_statistics['rating']}")
-                if "rating" in duo_statistics and duo_statistics["season"]["id"] == current_season:
-                    roster["2v2"][character_name] = duo_statistics["rating"]
-                    log.debug(f"{character_name} has 2v2 rating {duo_statistics['rating']}")
-                if "rating" in tri_statistics and tri_statistics["season"]["id"] == current_season:
-                    roster["3v3"][character_name] = tri_statistics["rating"]
-                    log.debug(f"{character_name} has 3v3 rating {tri_statistics['rating']}")
-
-        roster["rbg"] = dict(sorted(roster["rbg"].items(), key=lambda i: i[1], reverse=True))
-        roster["2v2"] = dict(sorted(roster["2v2"].items(), key=lambda i: i[1], reverse=True))
-        roster["3v3"] = dict(sorted(roster["3v3"].items(), key=lambda i: i[1], reverse=True))
-
-        return await self._make_tabulate_lists(max_chars, roster)
+                    for bracket in PVP_BRACKETS
+                ]
+            )
+        except ClientResponseError:
+            return {}
+        except (ClientError, asyncio.TimeoutError):
+            # Skip just this member, instead of failing the whole refresh
+            log.debug(f"Could not get PvP data for {character_name}.", exc_info=True)
+            return {}
+
+        ratings = {}
+        for bracket, bracket_statistics in zip(PVP_BRACKETS, statistics):
+            if "rating" in bracket_statistics and bracket_statistics["season"]["id"] == season:
+                ratings[bracket] = bracket_statistics["rating"]
+                log.debug(f"{character_name} has {bracket} rating {bracket_statistics['rating']}")
+        return ratings
 
     @staticmethod
     async def _make_tabulate_lists(max_chars, roster):
@@ -882,6 +1278,85 @@ class Scoreboard:
         return guild_name, realm, region, sb_blacklist
 
 
+class RefreshScheduler:
+    """
+    Decides when each guild's scoreboard is refreshed next.
+
+    Every guild starts out being refreshed every ``base_interval`` seconds. After
+    ``backoff_after`` refreshes in a row without a ranking change, the interval doubles with
+    every further unchanged refresh, up to ``max_interval``. A change brings it straight back
+    to ``base_interval``, and so does the start of a new week, when most keys are run.
+    """
+
+    # How early a guild may be refreshed, so the loop's own timing doesn't skip a whole tick
+    GRACE = 10
+
+    def __init__(
+        self,
+        base_interval: float,
+        max_interval: float = SB_MAX_INTERVAL,
+        backoff_after: int = SB_BACKOFF_AFTER,
+    ):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.backoff_after = backoff_after
+        self._unchanged: Dict[int, int] = {}
+        self._next_due: Dict[int, float] = {}
+
+    def is_due(self, guild_id: int, region: Optional[str], now: float) -> bool:
+        """Whether a guild should be refreshed at ``now`` (a ``time.monotonic()`` timestamp)."""
+        if in_reset_window(region, datetime.now(timezone.utc)):
+            return True
+        return self._next_due.get(guild_id, 0) <= now + self.GRACE
+
+    def record(self, guild_id: int, changed: Optional[bool], started: float) -> None:
+        """
+        Schedule a guild's next refresh after one was done.
+
+        :param changed: Whether the rankings changed, or None if the refresh failed.
+            Failed refreshes are retried on the next tick without backing off further.
+        :param started: When the refresh's tick started, as a ``time.monotonic()`` timestamp.
+        """
+        if changed is None:
+            self._next_due[guild_id] = started
+            return
+        if changed:
+            self._unchanged[guild_id] = 0
+        else:
+            self._unchanged[guild_id] = self._unchanged.get(guild_id, 0) + 1
+        self._next_due[guild_id] = started + self.interval(guild_id)
+
+    def interval(self, guild_id: int) -> float:
+        """Seconds between refreshes of a guild, going by how long it has been quiet."""
+        backoff = self._unchanged.get(guild_id, 0) - self.backoff_after + 1
+        if backoff <= 0:
+            return self.base_interval
+        return min(self.base_interval * 2**backoff, self.max_interval)
+
+    def forget(self, guild_id: int) -> None:
+        """Refresh a guild on the next tick and start its backoff over."""
+        self._unchanged.pop(guild_id, None)
+        self._next_due.pop(guild_id, None)
+
+    def stats(self) -> Dict[int, float]:
+        """Current refresh interval of every guild that was refreshed at least once."""
+        return {guild_id: self.interval(guild_id) for guild_id in self._next_due}
+
+
+def in_reset_window(region: Optional[str], now: datetime) -> bool:
+    """Whether ``now`` falls in the first hours after the region's weekly reset."""
+    if region not in WEEKLY_RESETS:
+        # The reset times of KR and CN aren't known, so they never get the faster refreshes
+        return False
+    weekday, hour = WEEKLY_RESETS[region]
+    last_reset = now.replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(
+        days=(now.weekday() - weekday) % 7
+    )
+    if last_reset > now:
+        last_reset -= timedelta(days=7)
+    return now - last_reset < RESET_WINDOW
+
+
 class ClassColor(Enum):
     DEATH_KNIGHT = "#C41F3B"
     DEMON_HUNTER = "#A330C9"
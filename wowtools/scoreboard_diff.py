@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+
+@dataclass
+class RankingDiff:
+    """Changes between two renders of the same scoreboard."""
+
+    # name: (old rank, new rank)
+    moves: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    # name: (old score, new score)
+    score_deltas: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    # name: rank
+    new_entrants: Dict[str, int] = field(default_factory=dict)
+    # name: old rank
+    dropouts: Dict[str, int] = field(default_factory=dict)
+    # Indexes of table rows that look different, used to only redraw those rows
+    changed_rows: List[int] = field(default_factory=list)
+    created: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def __bool__(self) -> bool:
+        return bool(self.moves or self.score_deltas or self.new_entrants or self.dropouts)
+
+
+def diff_rankings(old_rows: List[list], new_rows: List[list]) -> RankingDiff:
+    """
+    Compare two scoreboard tables as returned by ``Scoreboard._get_dungeon_scores``.
+
+    :param old_rows: The previous table.
+    :param new_rows: The current table.
+    :return: Rank moves, score changes, new entrants, dropouts and the changed row indexes.
+    """
+    old = {row[1]: (rank, parse_score(row[2])) for rank, row in enumerate(old_rows, 1)}
+    new = {row[1]: (rank, parse_score(row[2])) for rank, row in enumerate(new_rows, 1)}
+
+    diff = RankingDiff()
+    for name, (rank, score) in new.items():
+        if name not in old:
+            diff.new_entrants[name] = rank
+            continue
+        old_rank, old_score = old[name]
+        if old_rank != rank:
+            diff.moves[name] = (old_rank, rank)
+        if old_score != score:
+            diff.score_deltas[name] = (old_score, score)
+    for name, (rank, __) in old.items():
+        if name not in new:
+            diff.dropouts[name] = rank
+
+    diff.changed_rows = [
+        index
+        for index in range(max(len(old_rows), len(new_rows)))
+        if index >= len(old_rows) or index >= len(new_rows) or old_rows[index] != new_rows[index]
+    ]
+    return diff
+
+
+def parse_score(score: str) -> int:
+    # Text scoreboards use humanized numbers like "3,105"
+    return int("".join(char for char in score if char.isdigit()) or 0)
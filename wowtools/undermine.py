@@ -0,0 +1,314 @@
+import struct
+import time
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+# Undermine.exchange stores prices in silver and times in seconds, or days for daily history
+VERSION_ITEM_STATE = 5
+COPPER_SILVER = 100
+DAY = 24 * 60 * 60
+
+# Commodities are kept under a fake realm ID per region
+COMMODITY_REALMS = {
+    "us": 32512,
+    "eu": 32513,
+    "tw": 32514,
+    "kr": 32515,
+}
+
+_HEADER = struct.Struct("<BIII")
+_COUNT = struct.Struct("<H")
+_BYTE = struct.Struct("<B")
+_SPECIFIC_PRICE = struct.Struct("<I")
+
+_AUCTION = np.dtype([("price", "<u4"), ("quantity", "<u4")])
+_MODIFIER = np.dtype([("type", "<u2"), ("value", "<u4")])
+_SNAPSHOT = np.dtype([("snapshot", "<u4"), ("price", "<u4"), ("quantity", "<u4")])
+_DAY = np.dtype([("day", "<u2"), ("price", "<u4"), ("quantity", "<u4")])
+
+
+class Specific(NamedTuple):
+    price: int
+    # Modifier type: value, or just a timewalker level in version 3
+    modifiers: Dict[Union[int, str], int]
+    bonuses: Tuple[int, ...]
+
+
+class ItemState(NamedTuple):
+    """
+    An item's state in one of undermine.exchange's item files.
+
+    Prices are in copper and times are Unix timestamps in seconds. Every array is aligned
+    with the others of its group, auctions and specifics are sorted cheapest first.
+    """
+
+    version: int
+    snapshot: int
+    price: int
+    quantity: int
+    auction_prices: np.ndarray
+    auction_quantities: np.ndarray
+    specifics: List[Specific]
+    snapshot_times: np.ndarray
+    snapshot_prices: np.ndarray
+    snapshot_quantities: np.ndarray
+    # One entry per day from the first to the last recorded one, days without data repeat the
+    # price of the day before with no quantity
+    daily_times: np.ndarray
+    daily_prices: np.ndarray
+    daily_quantities: np.ndarray
+
+
+def undermine_item_url(region: str, item_id: int) -> str:
+    realm = COMMODITY_REALMS[region.lower()]
+    return f"https://undermine.exchange/data/cached/{realm}/{item_id & 0xFF}/{item_id}.bin"
+
+
+def read_item_state(data: bytes) -> ItemState:
+    """
+    Decode an undermine.exchange item file.
+
+    Fixed size records are read as whole arrays straight from the buffer, only specifics,
+    which differ in size, are read one at a time.
+
+    :raises ValueError: If the data is of an unknown version or cut short.
+    """
+    view = memoryview(data)
+    try:
+        version, snapshot, price, quantity = _HEADER.unpack_from(view, 0)
+        if version not in (3, 4, VERSION_ITEM_STATE):
+            raise ValueError("Unknown data version for item state.")
+        # Version 3 only stored a timewalker level, version 4 had no daily history
+        full_modifiers = version != 3
+        daily_history = version != 4
+        offset = _HEADER.size
+
+        auctions, offset = _read_array(view, offset, _AUCTION)
+        order = np.argsort(auctions["price"], kind="stable")
+        auction_prices = auctions["price"][order].astype(np.int64) * COPPER_SILVER
+        auction_quantities = auctions["quantity"][order].astype(np.int64)
+
+        specifics = []
+        (count,) = _COUNT.unpack_from(view, offset)
+        offset += _COUNT.size
+        for __ in range(count):
+            (specific_price,) = _SPECIFIC_PRICE.unpack_from(view, offset)
+            offset += _SPECIFIC_PRICE.size
+            (modifier_count,) = _BYTE.unpack_from(view, offset)
+            offset += _BYTE.size
+            if full_modifiers:
+                modifiers = np.frombuffer(view, _MODIFIER, modifier_count, offset)
+                offset += modifiers.nbytes
+                specific_modifiers = dict(
+                    zip(modifiers["type"].tolist(), modifiers["value"].tolist())
+                )
+            else:
+                # The count is the timewalker level in this version
+                specific_modifiers = {"timewalker_level": modifier_count} if modifier_count else {}
+            (bonus_count,) = _BYTE.unpack_from(view, offset)
+            offset += _BYTE.size
+            bonuses = np.frombuffer(view, "<u2", bonus_count, offset)
+            offset += bonuses.nbytes
+            specifics.append(
+                Specific(
+                    specific_price * COPPER_SILVER,
+                    specific_modifiers,
+                    tuple(sorted(bonuses.tolist())),
+                )
+            )
+        specifics.sort(key=lambda specific: specific.price)
+
+        snapshots, offset = _read_array(view, offset, _SNAPSHOT)
+        snapshot_prices = snapshots["price"].astype(np.int64) * COPPER_SILVER
+        snapshot_quantities = snapshots["quantity"].astype(np.int64)
+        # Snapshots where nothing was listed have no price, they keep the previous one instead
+        has_price = (snapshot_prices != 0) | (snapshot_quantities != 0)
+        has_price[:1] = True
+        last_priced = np.maximum.accumulate(np.where(has_price, np.arange(len(snapshots)), 0))
+        snapshot_prices = snapshot_prices[last_priced]
+
+        if daily_history:
+            days, offset = _read_array(view, offset, _DAY)
+        else:
+            days = np.zeros(0, dtype=_DAY)
+    except struct.error as e:
+        raise ValueError("The item state is cut short.") from e
+
+    daily_times, daily_prices, daily_quantities = _fill_days(days)
+    return ItemState(
+        version=version,
+        snapshot=snapshot,
+        price=price * COPPER_SILVER,
+        quantity=quantity,
+        auction_prices=auction_prices,
+        auction_quantities=auction_quantities,
+        specifics=specifics,
+        snapshot_times=snapshots["snapshot"].astype(np.int64),
+        snapshot_prices=snapshot_prices,
+        snapshot_quantities=snapshot_quantities,
+        daily_times=daily_times,
+        daily_prices=daily_prices,
+        daily_quantities=daily_quantities,
+    )
+
+
+def _read_array(view: memoryview, offset: int, dtype: np.dtype) -> Tuple[np.ndarray, int]:
+    """Read a count prefixed array of records, without copying it."""
+    (count,) = _COUNT.unpack_from(view, offset)
+    offset += _COUNT.size
+    if offset + count * dtype.itemsize > len(view):
+        raise ValueError("The item state is cut short.")
+    records = np.frombuffer(view, dtype, count, offset)
+    return records, offset + records.nbytes
+
+
+def _fill_days(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if not len(days):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.copy(), empty.copy()
+    day_numbers = days["day"].astype(np.int64)
+    every_day = np.arange(day_numbers[0], day_numbers[-1] + 1)
+    # The last recorded day on or before each day
+    recorded = np.searchsorted(day_numbers, every_day, side="right") - 1
+    was_recorded = day_numbers[recorded] == every_day
+    return (
+        every_day * DAY,
+        days["price"][recorded].astype(np.int64) * COPPER_SILVER,
+        np.where(was_recorded, days["quantity"][recorded].astype(np.int64), 0),
+    )
+
+
+def benchmark_decode(auctions: int = 5000, iterations: int = 20) -> Dict[str, float]:
+    """
+    Time decoding a large item file.
+
+    :param auctions: Auctions and snapshots the generated item file has.
+    :return: Size of the item file in kilobytes, and average milliseconds per decode for the old
+        per field decoder and the current one.
+    """
+    data = _make_item_state(auctions)
+
+    start = time.perf_counter()
+    for __ in range(iterations):
+        _read_item_state_per_field(data)
+    before = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for __ in range(iterations):
+        read_item_state(data)
+    after = (time.perf_counter() - start) / iterations
+
+    return {"size": len(data) / 1024, "before": before * 1000, "after": after * 1000}
+
+
+def _make_item_state(auctions: int) -> bytes:
+    rng = np.random.default_rng(0)
+    now = int(time.time())
+    parts = [_HEADER.pack(VERSION_ITEM_STATE, now, 1000, auctions * 10)]
+
+    records = np.zeros(auctions, dtype=_AUCTION)
+    records["price"] = rng.integers(1, 1_000_000, auctions)
+    records["quantity"] = rng.integers(1, 200, auctions)
+    parts += [_COUNT.pack(auctions), records.tobytes()]
+
+    specifics = min(auctions, 200)
+    parts.append(_COUNT.pack(specifics))
+    for index in range(specifics):
+        parts.append(_SPECIFIC_PRICE.pack(index + 1) + _BYTE.pack(2))
+        parts.append(np.array([(9, 70), (29, 2)], dtype=_MODIFIER).tobytes())
+        parts.append(_BYTE.pack(3) + np.array([1, 2, 3], dtype="<u2").tobytes())
+
+    snapshots = min(auctions, 65535)
+    records = np.zeros(snapshots, dtype=_SNAPSHOT)
+    records["snapshot"] = now - np.arange(snapshots)[::-1] * 3600
+    records["price"] = rng.integers(0, 1_000_000, snapshots)
+    records["quantity"] = rng.integers(0, 200, snapshots)
+    parts += [_COUNT.pack(snapshots), records.tobytes()]
+
+    days = min(auctions, 730)
+    records = np.zeros(days, dtype=_DAY)
+    records["day"] = now // DAY - np.arange(days * 2, 0, -2)
+    records["price"] = rng.integers(1, 1_000_000, days)
+    records["quantity"] = rng.integers(1, 200, days)
+    parts += [_COUNT.pack(days), records.tobytes()]
+    return b"".join(parts)
+
+
+def _read_item_state_per_field(data: bytes) -> dict:
+    # The per field decoder read_item_state replaced, only kept as a baseline for
+    # benchmark_decode
+    view = memoryview(data)
+    offset = 0
+
+    def read(byte_count):
+        nonlocal offset
+        result = offset
+        offset += byte_count
+        return result
+
+    version = struct.unpack_from("B", view, read(1))[0]
+    full_modifiers = version != 3
+    daily_history = version != 4
+    result = {
+        "snapshot": struct.unpack_from("<I", view, read(4))[0],
+        "price": struct.unpack_from("<I", view, read(4))[0] * COPPER_SILVER,
+        "quantity": struct.unpack_from("<I", view, read(4))[0],
+    }
+
+    result["auctions"] = []
+    for __ in range(struct.unpack_from("<H", view, read(2))[0]):
+        price = struct.unpack_from("<I", view, read(4))[0] * COPPER_SILVER
+        quantity = struct.unpack_from("<I", view, read(4))[0]
+        result["auctions"].append({"price": price, "quantity": quantity})
+    result["auctions"].sort(key=lambda x: x["price"])
+
+    result["specifics"] = []
+    for __ in range(struct.unpack_from("<H", view, read(2))[0]):
+        price = struct.unpack_from("<I", view, read(4))[0] * COPPER_SILVER
+        modifiers = {}
+        if full_modifiers:
+            for __ in range(struct.unpack_from("B", view, read(1))[0]):
+                type_ = struct.unpack_from("<H", view, read(2))[0]
+                value = struct.unpack_from("<I", view, read(4))[0]
+                modifiers[type_] = value
+        else:
+            level = struct.unpack_from("B", view, read(1))[0]
+            if level:
+                modifiers["timewalker_level"] = level
+        bonuses = [
+            struct.unpack_from("<H", view, read(2))[0]
+            for __ in range(struct.unpack_from("B", view, read(1))[0])
+        ]
+        bonuses.sort()
+        result["specifics"].append({"price": price, "modifiers": modifiers, "bonuses": bonuses})
+    result["specifics"].sort(key=lambda x: x["price"])
+
+    result["snapshots"] = []
+    prev_price = None
+    for __ in range(struct.unpack_from("<H", view, read(2))[0]):
+        snapshot = struct.unpack_from("<I", view, read(4))[0]
+        price = struct.unpack_from("<I", view, read(4))[0] * COPPER_SILVER
+        quantity = struct.unpack_from("<I", view, read(4))[0]
+        if quantity == 0 and price == 0 and prev_price is not None:
+            price = prev_price
+        prev_price = price
+        result["snapshots"].append({"snapshot": snapshot, "price": price, "quantity": quantity})
+
+    result["daily"] = []
+    if daily_history:
+        for __ in range(struct.unpack_from("<H", view, read(2))[0]):
+            snapshot = struct.unpack_from("<H", view, read(2))[0] * DAY
+            price = struct.unpack_from("<I", view, read(4))[0] * COPPER_SILVER
+            quantity = struct.unpack_from("<I", view, read(4))[0]
+            day_state = {"snapshot": snapshot, "price": price, "quantity": quantity}
+            if result["daily"]:
+                prev_seen = result["daily"][-1]
+                lost_day = prev_seen["snapshot"] + DAY
+                while lost_day < day_state["snapshot"]:
+                    result["daily"].append(
+                        {"snapshot": lost_day, "price": prev_seen["price"], "quantity": 0}
+                    )
+                    lost_day += DAY
+            result["daily"].append(day_state)
+    return result
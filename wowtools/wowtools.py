@@ -1,5 +1,9 @@
+import asyncio
 import datetime
+import io
+import json
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from typing import Literal, Mapping, Optional
 
 import aiohttp
@@ -10,24 +14,47 @@ from discord.ext import tasks
 from raiderio_async import RaiderIO
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import bundled_data_path, cog_data_path
 from redbot.core.i18n import Translator, cog_i18n, set_contextual_locales_from_guild
-from redbot.core.utils.chat_formatting import humanize_list
+from redbot.core.utils.chat_formatting import box, humanize_list, pagify
+from tabulate import tabulate
 
 from wowtools.user_installable.cvardocs import CVar, CVarDocs
 
 from .auctionhouse import AuctionHouse
+from .auctions import AuctionSnapshotStore
+from .avatars import AvatarCache
+from .cache import TTLCache
+from .crafting import CraftPricer, RecipeBook
+from .embed_cache import EmbedCache
 from .guildmanage import GuildManage
+from .history import ScoreboardHistory
+from .metrics import Metrics, timed_loop, to_prometheus
+from .name_index import NameIndex
 from .on_message import OnMessage
+from .price_history import PriceHistory
+from .price_service import PriceService
+from .price_watch import PriceWatchlist
 from .pvp import PvP
+from .pvp_store import PvPStore
 from .raiderio import Raiderio
-from .scoreboard import Scoreboard
+from .realm_index import ConnectedRealmIndex
+from .renderer import benchmark_render
+from .scoreboard import RefreshScheduler, Scoreboard
+from .scoreboard_diff import RankingDiff
 from .token import Token
+from .undermine import benchmark_decode
 from .user_installable.auctionhouse import UserInstallableAuctionHouse
 from .user_installable.raiderio import UserInstallableRaiderio
 
 log = logging.getLogger("red.karlo-cogs.wowtools")
 _ = Translator("WoWTools", __file__)
 
+# Raider.io guild rosters don't change that often, and several servers can share a guild
+ROSTER_CACHE_TTL = 240
+# Raider.io slug of the current Mythic+ season, can be changed with [p]wowset scoreboard season
+DEFAULT_MPLUS_SEASON = "season-mn-1"
+
 
 @cog_i18n(_)
 class WoWTools(
@@ -46,7 +73,6 @@ class WoWTools(
     """Interact with various World of Warcraft APIs"""
 
     def __init__(self, bot):
-        self.on_message_cache: dict = {}
         self.bot: Red = bot
         self.config = Config.get_conf(self, identifier=42069)
         default_global = {
@@ -58,6 +84,13 @@ class WoWTools(
             },
             "assistant_cog_integration": False,
             "status_guild": [],
+            "sb_concurrency": 10,
+            "sb_guild_timeout": 120,
+            "sb_start_jitter": 10,
+            "render_workers": 2,
+            "mplus_season": DEFAULT_MPLUS_SEASON,
+            "cutoff_cache_ttl": 3600,
+            "pvp_concurrency": 5,
         }
         default_guild = {
             "region": None,
@@ -74,6 +107,7 @@ class WoWTools(
             "scoreboard_channel": None,
             "scoreboard_message": None,
             "scoreboard_blacklist": [],
+            "scoreboard_digest": None,
             "sb_image": False,
             "on_message": False,
             "countdown_channel": None,
@@ -82,16 +116,59 @@ class WoWTools(
             "wow_character_name": None,
             "wow_character_realm": None,
             "wow_character_region": None,
+            "price_watches": [],
         }
         self.config.register_global(**default_global)
         self.config.register_guild(**default_guild)
         self.config.register_user(**default_user)
         self.limiter = AsyncLimiter(100, time_period=1)
-        self.session = aiohttp.ClientSession(headers={"User-Agent": "Red-DiscordBot/WoWToolsCog"})
+        self.metrics = Metrics()
+        self.session = aiohttp.ClientSession(
+            headers={"User-Agent": "Red-DiscordBot/WoWToolsCog"},
+            trace_configs=[self.metrics.trace_config()],
+        )
         self.raiderio_api = RaiderIO()
         self.blizzard: dict[str, WowApi] = {}
         self.cvar_cache: list[CVar] = []
-        self.roster_cache: dict[int, dict] = {}
+        self.roster_cache = TTLCache(ttl=ROSTER_CACHE_TTL)
+        self.avatar_cache = AvatarCache(self.session, cog_data_path(self) / "avatars")
+        self.cutoff_cache = TTLCache(ttl=3600)
+        self.embed_cache = EmbedCache(cog_data_path(self) / "embeds.json")
+        self.mplus_season: str = DEFAULT_MPLUS_SEASON
+        self.sb_tick_stats: dict = {}
+        self.sb_scheduler = RefreshScheduler(self.update_dungeon_scoreboard.minutes * 60)
+        self.scoreboard_messages: dict[int, discord.Message | discord.PartialMessage] = {}
+        # guild ID: time.monotonic() of when the scoreboard message was last known to exist
+        self.scoreboard_checked: dict[int, float] = {}
+        # guild ID: (whether the rows are for an image scoreboard, rows)
+        self.scoreboard_rows: dict[int, tuple[bool, list]] = {}
+        self.scoreboard_diffs: dict[int, RankingDiff] = {}
+        self.scoreboard_image_path = cog_data_path(self) / "scoreboards"
+        self.scoreboard_image_path.mkdir(parents=True, exist_ok=True)
+        self.render_executor: Optional[ProcessPoolExecutor] = None
+        self.scoreboard_history = ScoreboardHistory(cog_data_path(self) / "history.sqlite3")
+        self.auction_snapshots = AuctionSnapshotStore(
+            self.session, self.blizzard.get, self.limiter
+        )
+        self.realm_index = ConnectedRealmIndex(
+            cog_data_path(self) / "connected_realms.json", self.fetch_connected_realms
+        )
+        self.name_index = NameIndex(cog_data_path(self) / "names", self.fetch_name_page)
+        self.price_service = PriceService(
+            self.blizzard.get,
+            self.limiter,
+            self.metrics,
+            self.auction_snapshots,
+            self.realm_index,
+            self.name_index,
+        )
+        self.pvp_store = PvPStore(cog_data_path(self) / "pvp")
+        self.price_history = PriceHistory(cog_data_path(self) / "price_history")
+        self.price_watchlist = PriceWatchlist()
+        self.recipe_book = RecipeBook(cog_data_path(self) / "recipes.json", self.fetch_recipes)
+        # (region, connected realm ID): memoized crafting costs of that auction house
+        self.craft_pricers: dict[tuple[str, int], CraftPricer] = {}
+        self.pvp_jobs: dict[int, asyncio.Task] = {}
         self.update_dungeon_scoreboard.start()
         log.info("Dungeon scoreboard updater started.")
         self.guild_log.start()
@@ -100,6 +177,8 @@ class WoWTools(
         log.info("Countdown channel updater started.")
         self.update_bot_status.start()
         log.info("Bot status updater started.")
+        self.refresh_auction_snapshots.start()
+        log.info("Auction snapshot updater started.")
 
         self.current_raid = "tier-mn-1"
 
@@ -125,6 +204,32 @@ class WoWTools(
         raiderio_api_key = await self.bot.get_shared_api_tokens("raiderio")
         self.raiderio_api = RaiderIO(api_key=raiderio_api_key.get("api_key"))
         await self.create_bnet_objs()
+        await self.create_render_executor()
+        self.mplus_season = await self.config.mplus_season()
+        cutoff_ttl: int = await self.config.cutoff_cache_ttl()
+        self.cutoff_cache.ttl = cutoff_ttl
+        self.refresh_season_cutoffs.change_interval(seconds=cutoff_ttl)
+        for guild_id in await self.pvp_store.unfinished():
+            self.start_pvp_refresh(guild_id)
+        await self.realm_index.load()
+        await self.name_index.load()
+        await self.recipe_book.load()
+        await self.embed_cache.load()
+        self.price_watchlist.load(await self.config.all_users())
+        # Started here since they need the Blizzard clients and the indexes from the disk
+        self.refresh_realm_index.start()
+        self.refresh_name_index.start()
+        self.refresh_recipes.start()
+        # Needs the season, the refresh interval and the Raider.io API key set above
+        self.refresh_season_cutoffs.start()
+        log.info("Season cutoff updater started.")
+
+    async def create_render_executor(self):
+        if self.render_executor:
+            self.render_executor.shutdown(wait=False, cancel_futures=True)
+        workers: int = await self.config.render_workers()
+        # With no workers, images are rendered in the event loop's default thread pool instead
+        self.render_executor = ProcessPoolExecutor(max_workers=workers) if workers else None
 
     async def create_bnet_objs(self):
         blizzard_api = await self.bot.get_shared_api_tokens("blizzard")
@@ -239,16 +344,292 @@ class WoWTools(
         enabled = await self.config.guild(ctx.guild).sb_image()
         if enabled:
             await self.config.guild(ctx.guild).sb_image.set(False)
+            self.sb_scheduler.forget(ctx.guild.id)
             await ctx.send(_("Images disabled."), ephemeral=True)
         else:
             await self.config.guild(ctx.guild).sb_image.set(True)
+            self.sb_scheduler.forget(ctx.guild.id)
             await ctx.send(_("Images enabled."), ephemeral=True)
 
+    @wowset.command(name="cachestats")
+    @commands.is_owner()
+    async def wowset_cachestats(self, ctx: commands.Context):
+        """Show hit and miss counts of the cog's caches."""
+        caches = {
+            _("Raider.io rosters"): self.roster_cache,
+            _("Character thumbnails"): self.avatar_cache,
+            _("Season cutoffs"): self.cutoff_cache,
+            _("Price lookups"): self.price_service.cache,
+            _("Item icons"): self.price_service.icons,
+            _("Item and spell embeds"): self.embed_cache,
+        }
+        table = [
+            [
+                name,
+                len(cache),
+                cache.hits,
+                cache.coalesced,
+                cache.misses,
+                f"{cache.hit_ratio:.0%}",
+            ]
+            for name, cache in caches.items()
+        ]
+        headers = [_("Cache"), _("Size"), _("Hits"), _("Coalesced"), _("Misses"), _("Hit ratio")]
+        await ctx.send(box(tabulate(table, headers=headers, tablefmt="plain")))
+
+    @wowset.group(name="metrics", invoke_without_command=True)
+    @commands.is_owner()
+    async def wowset_metrics(self, ctx: commands.Context):
+        """Show how long the background tasks take and what they spend their time on."""
+        snapshot = self.metrics_snapshot()
+        msg = _("Background loops:\n")
+        msg += box(
+            tabulate(
+                [
+                    [
+                        loop,
+                        timing["count"],
+                        f"{timing['last'] * 1000:.0f}",
+                        f"{timing['average'] * 1000:.0f}",
+                        f"{timing['max'] * 1000:.0f}",
+                        timing["overruns"],
+                        timing["errors"],
+                    ]
+                    for loop, timing in snapshot["loops"].items()
+                ],
+                headers=[
+                    _("Loop"),
+                    _("Runs"),
+                    _("Last ms"),
+                    _("Avg ms"),
+                    _("Max ms"),
+                    _("Overruns"),
+                    _("Errors"),
+                ],
+                tablefmt="plain",
+            )
+        )
+        msg += _("Steps:\n")
+        msg += box(
+            tabulate(
+                [
+                    [
+                        step,
+                        timing["count"],
+                        f"{timing['average'] * 1000:.0f}",
+                        f"{timing['max'] * 1000:.0f}",
+                        f"{timing['total']:.1f}",
+                    ]
+                    for step, timing in sorted(
+                        snapshot["steps"].items(), key=lambda i: i[1]["total"], reverse=True
+                    )
+                ],
+                headers=[_("Step"), _("Runs"), _("Avg ms"), _("Max ms"), _("Total s")],
+                tablefmt="plain",
+            )
+        )
+        msg += _("HTTP requests:\n")
+        msg += box(
+            tabulate(
+                sorted(snapshot["requests"].items(), key=lambda i: i[1], reverse=True),
+                headers=[_("API"), _("Requests")],
+                tablefmt="plain",
+            )
+        )
+        msg += _("Caches:\n")
+        msg += box(
+            tabulate(
+                [
+                    [name, cache["size"], f"{cache['hit_ratio']:.0%}"]
+                    for name, cache in snapshot["caches"].items()
+                ],
+                headers=[_("Cache"), _("Size"), _("Hit ratio")],
+                tablefmt="plain",
+            )
+        )
+        for page in pagify(msg, delims=["```"], priority=True):
+            await ctx.send(page)
+
+    @wowset_metrics.command(name="dump")
+    async def wowset_metrics_dump(
+        self, ctx: commands.Context, fmt: Literal["json", "prometheus"] = "json"
+    ):
+        """Export the metrics as JSON or in the Prometheus text format.
+
+        The file is also written to the cog's data folder, so it can be scraped from there.
+        """
+        snapshot = self.metrics_snapshot()
+        if fmt == "json":
+            data = json.dumps(snapshot, indent=2)
+            filename = "metrics.json"
+        else:
+            data = to_prometheus(snapshot)
+            filename = "metrics.prom"
+        await asyncio.to_thread((cog_data_path(self) / filename).write_text, data)
+        await ctx.send(file=discord.File(io.BytesIO(data.encode()), filename=filename))
+
+    def metrics_snapshot(self) -> dict:
+        return self.metrics.snapshot(
+            {
+                "raiderio_rosters": self.roster_cache,
+                "character_thumbnails": self.avatar_cache,
+                "season_cutoffs": self.cutoff_cache,
+                "price_lookups": self.price_service.cache,
+                "item_icons": self.price_service.icons,
+                "embeds": self.embed_cache,
+            }
+        )
+
     @wowset.group(name="character")
     async def wowset_character(self, ctx):
         """Character settings."""
         pass
 
+    @wowset.group(name="scoreboard")
+    @commands.is_owner()
+    async def wowset_scoreboard(self, ctx: commands.Context):
+        """Tune the background scoreboard updater."""
+        pass
+
+    @wowset_scoreboard.command(name="concurrency")
+    async def wowset_scoreboard_concurrency(self, ctx: commands.Context, guilds: int):
+        """Set how many guild scoreboards can be updated at the same time."""
+        if guilds < 1:
+            await ctx.send(_("Concurrency must be at least 1."))
+            return
+        await self.config.sb_concurrency.set(guilds)
+        await ctx.send(_("Scoreboard concurrency set to {guilds}.").format(guilds=guilds))
+
+    @wowset_scoreboard.command(name="pvpconcurrency")
+    async def wowset_scoreboard_pvpconcurrency(self, ctx: commands.Context, members: int):
+        """Set how many guild members are checked at the same time when building PvP scoreboards."""
+        if members < 1:
+            await ctx.send(_("Concurrency must be at least 1."))
+            return
+        await self.config.pvp_concurrency.set(members)
+        await ctx.send(_("PvP scoreboard concurrency set to {members}.").format(members=members))
+
+    @wowset_scoreboard.command(name="timeout")
+    async def wowset_scoreboard_timeout(self, ctx: commands.Context, seconds: int):
+        """Set how long a single guild's scoreboard update can take before it's abandoned."""
+        if seconds < 1:
+            await ctx.send(_("Timeout must be at least 1 second."))
+            return
+        await self.config.sb_guild_timeout.set(seconds)
+        await ctx.send(_("Scoreboard timeout set to {seconds} seconds.").format(seconds=seconds))
+
+    @wowset_scoreboard.command(name="jitter")
+    async def wowset_scoreboard_jitter(self, ctx: commands.Context, seconds: int):
+        """Set the maximum random delay before a guild's scoreboard update starts."""
+        if seconds < 0:
+            await ctx.send(_("Jitter can't be negative."))
+            return
+        await self.config.sb_start_jitter.set(seconds)
+        await ctx.send(_("Scoreboard jitter set to {seconds} seconds.").format(seconds=seconds))
+
+    @wowset_scoreboard.command(name="renderworkers")
+    async def wowset_scoreboard_renderworkers(self, ctx: commands.Context, workers: int):
+        """Set how many processes are used to render scoreboard images.
+
+        Set to 0 to render in a thread of the bot's process instead.
+        """
+        if workers < 0:
+            await ctx.send(_("The number of workers can't be negative."))
+            return
+        await self.config.render_workers.set(workers)
+        await self.create_render_executor()
+        await ctx.send(_("Scoreboard render workers set to {workers}.").format(workers=workers))
+
+    @wowset_scoreboard.command(name="season")
+    async def wowset_scoreboard_season(self, ctx: commands.Context, season: str):
+        """Set the Raider.io slug of the current Mythic+ season.
+
+        **Example:**
+        `[p]wowset scoreboard season season-mn-1`
+        """
+        season = season.lower()
+        await self.config.mplus_season.set(season)
+        self.mplus_season = season
+        self.cutoff_cache.invalidate()
+        self.refresh_season_cutoffs.restart()
+        await ctx.send(_("Mythic+ season set to `{season}`.").format(season=season))
+
+    @wowset_scoreboard.command(name="cutoffttl")
+    async def wowset_scoreboard_cutoffttl(self, ctx: commands.Context, seconds: int):
+        """Set how often season title cutoffs are refreshed."""
+        if seconds < 60:
+            await ctx.send(_("Cutoffs can't be refreshed more than once a minute."))
+            return
+        await self.config.cutoff_cache_ttl.set(seconds)
+        self.cutoff_cache.ttl = seconds
+        self.refresh_season_cutoffs.change_interval(seconds=seconds)
+        await ctx.send(
+            _("Season cutoffs will be refreshed every {seconds} seconds.").format(seconds=seconds)
+        )
+
+    @wowset_scoreboard.command(name="benchmark", hidden=True)
+    async def wowset_scoreboard_benchmark(self, ctx: commands.Context, iterations: int = 20):
+        """Compare the old and current scoreboard image renderers."""
+        async with ctx.typing():
+            timings = await asyncio.get_running_loop().run_in_executor(
+                self.render_executor,
+                benchmark_render,
+                str(bundled_data_path(self)),
+                max(iterations, 1),
+            )
+        await ctx.send(
+            _(
+                "Average render time per scoreboard over {iterations} renders:\n"
+                "Before: {before:.1f} ms\nAfter: {after:.1f} ms"
+            ).format(iterations=max(iterations, 1), **timings)
+        )
+
+    @wowset.command(name="decodebenchmark", hidden=True)
+    @commands.is_owner()
+    async def wowset_decodebenchmark(
+        self, ctx: commands.Context, auctions: int = 5000, iterations: int = 20
+    ):
+        """Compare the old and current undermine.exchange item file decoders."""
+        auctions = min(max(auctions, 1), 65535)
+        iterations = min(max(iterations, 1), 100)
+        async with ctx.typing():
+            timings = await asyncio.to_thread(benchmark_decode, auctions, iterations)
+        await ctx.send(
+            _(
+                "Average decode time of a {size:.0f} KB item file over {iterations} decodes:\n"
+                "Before: {before:.2f} ms\nAfter: {after:.2f} ms"
+            ).format(iterations=iterations, **timings)
+        )
+
+    @wowset_scoreboard.command(name="status")
+    async def wowset_scoreboard_status(self, ctx: commands.Context):
+        """Show the results of the last scoreboard update."""
+        if not self.sb_tick_stats:
+            await ctx.send(_("The scoreboard updater hasn't finished a run yet."))
+            return
+        msg = _(
+            "Last run finished <t:{timestamp}:R> and took {duration:.2f} seconds "
+            "for {guilds} servers, {deferred} quiet servers were skipped.\n"
+        ).format(
+            timestamp=int(self.sb_tick_stats["finished"].timestamp()),
+            duration=self.sb_tick_stats["duration"],
+            guilds=self.sb_tick_stats["guilds"],
+            deferred=self.sb_tick_stats["deferred"],
+        )
+        intervals = self.sb_scheduler.stats().values()
+        backed_off = sum(interval > self.sb_scheduler.base_interval for interval in intervals)
+        msg += _("{backed_off} servers are currently refreshed less often.\n").format(
+            backed_off=backed_off
+        )
+        failures: dict[int, str] = self.sb_tick_stats["failures"]
+        if failures:
+            msg += _("Failed servers:\n")
+            msg += "\n".join(f"{guild_id}: {error}" for guild_id, error in failures.items())
+        else:
+            msg += _("No servers failed.")
+        for page in pagify(msg):
+            await ctx.send(page)
+
     @wowset_character.command(name="name")
     async def wowset_character_name(self, ctx, character_name: str):
         """Set your character name."""
@@ -363,14 +744,20 @@ class WoWTools(
         await ctx.tick()
 
     @tasks.loop(minutes=6)
+    @timed_loop("update_countdown_channels")
     async def update_countdown_channels(self):
-        for guild in self.bot.guilds:
-            if await self.bot.cog_disabled_in_guild(self, guild):
-                continue
-            region = await self.config.guild(guild).region()
-            countdown_channel_id: int = await self.config.guild(guild).countdown_channel()
+        # One snapshot of the config per tick instead of several reads per guild
+        all_guilds: dict[int, dict] = await self.config.all_guilds()
+        for guild_id, guild_config in all_guilds.items():
+            region = guild_config["region"]
+            countdown_channel_id: int = guild_config["countdown_channel"]
             if countdown_channel_id is None:
                 continue
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            if await self.bot.cog_disabled_in_guild(self, guild):
+                continue
             await set_contextual_locales_from_guild(self.bot, guild)
 
             countdown_channel = guild.get_channel(countdown_channel_id)
@@ -439,6 +826,7 @@ class WoWTools(
         except ValueError:
             return False
 
+        self.metrics.count_request("raider.io")
         guild_data = await self.raiderio_api.get_guild_profile(
             region,
             realm,
@@ -455,6 +843,7 @@ class WoWTools(
         return True
 
     @tasks.loop(minutes=60)
+    @timed_loop("update_bot_status")
     async def update_bot_status(self):
         if not await self.set_bot_status():
             log.debug("Setting the bot's status failed.")
@@ -475,7 +864,18 @@ class WoWTools(
         self.guild_log.cancel()
         self.update_countdown_channels.cancel()
         self.update_bot_status.cancel()
+        self.refresh_season_cutoffs.cancel()
+        self.refresh_realm_index.cancel()
+        self.refresh_name_index.cancel()
+        self.refresh_recipes.cancel()
+        self.refresh_auction_snapshots.cancel()
+        for job in self.pvp_jobs.values():
+            job.cancel()
         log.info("All tasks cancelled.")
+        if self.render_executor:
+            self.render_executor.shutdown(wait=False, cancel_futures=True)
+        self.scoreboard_history.close()
+        await self.embed_cache.save()
 
     async def red_delete_data_for_user(
         self,
@@ -484,3 +884,4 @@ class WoWTools(
         user_id: int,
     ):
         await self.config.user_from_id(user_id).clear()
+        self.price_watchlist.load(await self.config.all_users())